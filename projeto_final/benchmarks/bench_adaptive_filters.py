@@ -0,0 +1,147 @@
+"""
+Time `lms`, `error_signal_lms` and `rls` against the per-sample implementations they replaced.
+
+Run from `projeto_final`, e.g. `python -m benchmarks.bench_adaptive_filters --num-samples 1000000`. The reference
+implementations below are the original ones, which roll the tap vector and rebuild the weights (and P) every
+sample, kept here only to be timed and compared against.
+
+Fails (with an `AssertionError`) if a filter is less than `--min-speedup` times faster than its original
+implementation, or its output differs from it by more than `--tolerance`.
+"""
+import argparse
+import time
+from typing import Callable, Tuple
+
+import numpy as np
+
+from simple_portfolio.adaptive_filters import error_signal_lms, lms, rls
+
+
+def reference_lms(signal: np.ndarray, reference: np.ndarray, num_parameters: int, pace: float) -> np.ndarray:
+    weights = np.zeros(num_parameters).reshape(-1, 1)
+    samples = np.zeros(num_parameters).reshape(-1, 1)
+    filtered_signal = np.zeros_like(signal)
+    weight_history = []
+
+    for n in range(signal.shape[0]):
+        weight_history.append(weights)
+        samples = np.roll(samples, 1)
+        samples[0] = signal[n]
+
+        estimate = weights.T @ samples
+        filtered_signal[n] = estimate[0, 0]
+
+        error = reference[n] - estimate
+
+        weights = weights + pace * samples * error
+
+    return filtered_signal
+
+
+def reference_error_signal_lms(
+    signal: np.ndarray,
+    reference: np.ndarray,
+    num_parameters: int,
+    pace: float
+) -> np.ndarray:
+    weights = np.zeros(num_parameters).reshape(-1, 1)
+    samples = np.zeros(num_parameters).reshape(-1, 1)
+    filtered_signal = np.zeros_like(signal)
+    weight_history = []
+
+    for n in range(signal.shape[0]):
+        weight_history.append(weights)
+        samples = np.roll(samples, 1)
+        samples[0] = signal[n]
+
+        estimate = weights.T @ samples
+        filtered_signal[n] = estimate[0, 0]
+
+        error_signal = np.sign(reference[n] - estimate)
+
+        weights = weights + pace * samples * error_signal
+
+    return filtered_signal
+
+
+def reference_rls(
+    signal: np.ndarray,
+    reference: np.ndarray,
+    num_parameters: int,
+    fading: float,
+    sigma: float
+) -> np.ndarray:
+    weights = np.zeros(num_parameters).reshape(-1, 1)
+    samples = np.zeros(num_parameters).reshape(-1, 1)
+    P = np.eye(num_parameters) / sigma
+    filtered_signal = np.zeros_like(signal)
+    weight_history = []
+
+    for n in range(signal.shape[0]):
+        weight_history.append(weights)
+        samples = np.roll(samples, 1)
+        samples[0] = signal[n]
+
+        estimate = weights.T @ samples
+        filtered_signal[n] = estimate[0, 0]
+
+        error = reference[n] - estimate
+        g = P @ samples / (fading + samples.T @ P @ samples)
+
+        P = P / fading - fading * g @ samples.T @ P
+        weights = weights + g * error
+
+    return filtered_signal
+
+
+def timed(function: Callable, *args) -> Tuple[float, np.ndarray]:
+    start = time.perf_counter()
+    output = function(*args)
+
+    return time.perf_counter() - start, output[0] if isinstance(output, tuple) else output
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--num-samples', type=int, default=1_000_000)
+    parser.add_argument('--num-parameters', type=int, default=11)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-speedup', type=float, default=10.0)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    arguments = parser.parse_args()
+
+    # System identification with white Gaussian noise input, as in `learning_curves`.
+    generator = np.random.default_rng(arguments.seed)
+    num_parameters = arguments.num_parameters
+    signal = generator.standard_normal(arguments.num_samples)
+    system = generator.standard_normal(num_parameters)
+    reference = np.convolve(signal, system)[:signal.shape[0]] + 0.1 * generator.standard_normal(signal.shape[0])
+    pace = 0.01 / num_parameters
+
+    cases = [
+        ('lms', lms, reference_lms, (num_parameters, pace)),
+        ('error_signal_lms', error_signal_lms, reference_error_signal_lms, (num_parameters, pace)),
+        ('rls', rls, reference_rls, (num_parameters, 0.99, 1.0)),
+    ]
+    print(f"{arguments.num_samples} samples, M = {num_parameters}")
+    print(f"{'filter':<18}{'reference (s)':>15}{'current (s)':>13}{'speedup':>9}{'max |difference|':>18}")
+    failures = []
+    for name, current, original, parameters in cases:
+        # The kernels are compiled on their first call, which is not what is being timed.
+        current(signal[:num_parameters], reference[:num_parameters], *parameters)
+        original_time, original_output = timed(original, signal, reference, *parameters)
+        current_time, current_output = timed(current, signal, reference, *parameters)
+        difference = np.abs(current_output - original_output).max()
+        speedup = original_time / current_time
+        print(f"{name:<18}{original_time:>15.2f}{current_time:>13.2f}{speedup:>8.1f}x{difference:>18.1e}")
+
+        if speedup < arguments.min_speedup:
+            failures.append(f"{name} is only {speedup:.1f}x faster (at least {arguments.min_speedup}x expected)")
+        if not difference <= arguments.tolerance:
+            failures.append(f"{name} differs from the original by {difference:.1e}")
+
+    assert not failures, '\n'.join(failures)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Time the RLS methods of `rls` on random-walk prices, the input of the RLS indicators.
+
+Run from `projeto_final`, e.g. `python -m benchmarks.bench_rls_methods --num-samples 1000000`. Fails (with an
+`AssertionError`) if the O(M) 'lattice' method is not faster than 'standard' for every `--num-parameters`, or its
+estimates drift from the ones of 'inverse_qr' (the same least squares problem) by more than `--tolerance`.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from simple_portfolio.adaptive_filters import RLS_METHODS, rls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--num-samples', type=int, default=1_000_000)
+    parser.add_argument('--num-parameters', type=int, nargs='+', default=[11, 21, 44])
+    parser.add_argument('--fading', type=float, default=0.99)
+    parser.add_argument('--sigma', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    arguments = parser.parse_args()
+
+    # Prices around 1e5 (like INDFUT), estimated from the previous price as in `bollinger.AdaptiveBands`.
+    generator = np.random.default_rng(arguments.seed)
+    prices = 1e5 + np.cumsum(20 * generator.standard_normal(arguments.num_samples))
+    entry = np.concatenate([prices[:1], prices[:-1]])
+    # The first samples differ with the initialization of each method.
+    settled = slice(min(1000, arguments.num_samples // 2), None)
+
+    print(f"{arguments.num_samples} samples")
+    print(f"{'M':>4}" + ''.join(f"{method + ' (s)':>18}" for method in RLS_METHODS) + f"{'lattice speedup':>17}")
+    failures = []
+    for num_parameters in arguments.num_parameters:
+        times, estimates = {}, {}
+        for method in RLS_METHODS:
+            # The kernels are compiled on their first call, which is not what is being timed.
+            rls(entry[:num_parameters], prices[:num_parameters], num_parameters, arguments.fading, arguments.sigma,
+                method, None)
+            start = time.perf_counter()
+            estimates[method], _ = rls(
+                entry, prices, num_parameters, arguments.fading, arguments.sigma, method, None
+            )
+            times[method] = time.perf_counter() - start
+
+        speedup = times['standard'] / times['lattice']
+        method_times = ''.join(f"{times[method]:>18.2f}" for method in RLS_METHODS)
+        print(f"{num_parameters:>4}{method_times}{speedup:>16.1f}x")
+
+        if speedup <= 1:
+            failures.append(f"lattice is slower than standard with M = {num_parameters}")
+        difference = np.abs(estimates['lattice'] - estimates['inverse_qr'])[settled] / np.abs(prices[settled])
+        if not difference.max() <= arguments.tolerance:
+            failures.append(f"lattice differs from inverse_qr by {difference.max():.1e} with M = {num_parameters}")
+
+    assert not failures, '\n'.join(failures)
+
+
+if __name__ == '__main__':
+    main()
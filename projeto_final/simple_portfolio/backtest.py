@@ -0,0 +1,175 @@
+"""Event loop of `Portfolio.backtest` over plain arrays."""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .order import Order
+from .transaction import Transaction
+
+
+class ArrayBacktest:
+    """
+    `Portfolio.backtest` over numpy arrays, extracted once from the ticks and signals.
+
+    The ticks' prices and quantities are sorted by period (datetime) and asset, with the offsets of each period,
+    and the non zero signals by period, so a period costs a few array lookups instead of slicing the DataFrames.
+    Orders are kept in plain lists, and only periods with open orders, signals or margin adjustments are visited
+    at all.
+
+    The portfolio's capital, positions, transactions and orders end up as with the 'pandas' engine, down to the
+    float rounding: positions are updated in place, and `run` starts from the portfolio's open orders and writes
+    them back at the end.
+    """
+    def __init__(self, portfolio, ticks: pd.DataFrame, signals: pd.DataFrame) -> None:
+        self.portfolio = portfolio
+
+        # Periods in order of appearance, as `index.unique()`, and ticks sorted by period and asset.
+        time_codes, self.times = pd.factorize(ticks.index.get_level_values('datetime'))
+        asset_codes, assets = pd.factorize(ticks.index.get_level_values('asset'), sort=True)
+        order = np.lexsort((asset_codes, time_codes))
+        self._asset_codes = {asset: code for code, asset in enumerate(assets)}
+        self._tick_assets = asset_codes[order]
+        self._tick_offsets = np.concatenate([[0], np.cumsum(np.bincount(time_codes, minlength=len(self.times)))])
+        self._high, self._low, self._quantity = (ticks[column].values[order] for column in ('high', 'low', 'quantity'))
+        codes, times_of_day = pd.factorize(self.times.time)
+        self._closing = np.array([str(time) == portfolio.closing_time for time in times_of_day])[codes]
+
+        # Non zero signals on the periods of the ticks, in their order within each period.
+        signal = signals['signal'].values
+        non_null = signal != 0
+        periods = self.times.get_indexer(signals.index.get_level_values('datetime')[non_null])
+        order = np.argsort(periods, kind='stable')
+        order = order[periods[order] >= 0]
+        self._signal_assets = list(signals.index.get_level_values('asset')[non_null][order])
+        self._signal_directions = ['SHORT' if value == -1 else 'LONG' for value in signal[non_null][order]]
+        self._signal_offsets = np.concatenate([
+            [0], np.cumsum(np.bincount(periods[order], minlength=len(self.times)))
+        ])
+
+        # Orders as columns, starting with the open ones of the order store, and the orders executed or cancelled,
+        # in the order they leave the open orders.
+        open_orders = portfolio.orders.get_open_orders()
+        self._next_order_id = portfolio.orders.next_id
+        self._order_ids = list(open_orders)
+        self._order_assets, self._order_prices, self._order_quantities, self._order_types, self._order_statuses = (
+            [getattr(order, attribute) for order in open_orders.values()]
+            for attribute in ('asset', 'price', 'quantity', 'order_type', 'status')
+        )
+        self._open_orders = list(range(len(self._order_ids)))
+        self._archived = []
+
+    def _events(self) -> np.ndarray:
+        """Periods where the portfolio may change: with signals or open orders, closings and the periods after."""
+        if self.portfolio.logger.isEnabledFor(logging.INFO):
+            return np.arange(len(self.times))
+
+        has_signals = np.diff(self._signal_offsets) > 0
+        is_event = has_signals | self._closing
+        is_event[1:] |= has_signals[:-1] | self._closing[:-1]
+        is_event[0] |= len(self._open_orders) > 0
+
+        return np.flatnonzero(is_event)
+
+    def run(self) -> float:
+        portfolio = self.portfolio
+        log_periods = portfolio.logger.isEnabledFor(logging.INFO)
+        closed = False
+        for period in self._events():
+            if closed:
+                portfolio._update_margins(closing=False)
+                closed = False
+
+            if log_periods:
+                portfolio.logger.info(f"Period {period}: Evaluating information for {self.times[period]}.")
+            self._process_period(period)
+
+            if self._closing[period]:
+                portfolio._update_margins(closing=True)
+                closed = True
+
+        self._write_orders()
+
+        return portfolio.available_capital
+
+    def _tick_row(self, period: int, asset: str) -> int:
+        """Row of the tick of `asset` in `period`, as `ticks.loc[time:time].xs(asset, level='asset')`."""
+        code = self._asset_codes[asset]
+        start, stop = self._tick_offsets[period], self._tick_offsets[period + 1]
+        row = start + self._tick_assets[start:stop].searchsorted(code)
+        if row == stop or self._tick_assets[row] != code:
+            raise KeyError(asset)
+
+        return row
+
+    def _process_period(self, period: int) -> None:
+        """`Portfolio.process_ticks` of a period."""
+        portfolio = self.portfolio
+
+        # `OrderStore.evaluate_open_orders`: every open order is executed or cancelled, asset by asset.
+        transactions_performed = []
+        for order in sorted(self._open_orders, key=self._order_assets.__getitem__):
+            row = self._tick_row(period, self._order_assets[order])
+            price = self._order_prices[order]
+            self._archived.append(order)
+            if price < self._low[row] or price > self._high[row]:
+                self._order_statuses[order] = 'CANCELLED'
+                continue
+
+            traded_quantity = min(self._order_quantities[order], self._quantity[row])
+            assert traded_quantity > 0, f"No contracts traded for order at {price} on {self.times[period]}."
+            if traded_quantity < self._order_quantities[order]:
+                self._order_statuses[order] = 'PARTIALLY_EXECUTED'
+            else:
+                self._order_statuses[order] = 'EXECUTED'
+            self._order_quantities[order] = traded_quantity
+            transactions_performed.append(order)
+        self._open_orders = []
+
+        timestamp = self.times[period] if transactions_performed else None
+        for order in transactions_performed:
+            transaction = Transaction(
+                self._order_assets[order], self._order_prices[order], self._order_quantities[order],
+                self._order_types[order], timestamp
+            )
+            _, profit, opened_contracts = portfolio.positions.update_position(transaction)
+            margin_required = portfolio._margin_required(opened_contracts)
+
+            if portfolio.available_capital - margin_required < 0:
+                portfolio.positions.rollback(transaction.asset)
+                self._order_statuses[order] = 'CANCELLED'
+                continue
+
+            portfolio._register_transaction(transaction)
+
+            portfolio.allocated_capital += margin_required
+            portfolio.available_capital += profit - margin_required
+
+        # `Portfolio.evaluate_signals`, placing the orders right away.
+        for signal in range(self._signal_offsets[period], self._signal_offsets[period + 1]):
+            asset, direction = self._signal_assets[signal], self._signal_directions[signal]
+            order_size = portfolio._get_order_size(asset, direction)
+            if order_size == 0:
+                continue
+
+            row = self._tick_row(period, asset)
+            price = self._low[row] if direction == 'SHORT' else self._high[row]
+            # Validates the order as `OrderStore.place_order` would.
+            Order(asset, price, order_size, direction)
+
+            self._open_orders.append(len(self._order_ids))
+            self._order_ids.append(self._next_order_id)
+            self._next_order_id += 1
+            self._order_assets.append(asset)
+            self._order_prices.append(price)
+            self._order_quantities.append(order_size)
+            self._order_types.append(direction)
+            self._order_statuses.append('OPEN')
+
+    def _write_orders(self) -> None:
+        orders = self.portfolio.orders
+        for order in self._archived + self._open_orders:
+            orders[self._order_ids[order]] = Order(
+                self._order_assets[order], self._order_prices[order], self._order_quantities[order],
+                self._order_types[order], self._order_statuses[order]
+            )
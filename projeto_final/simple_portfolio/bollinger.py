@@ -1,61 +1,325 @@
-from typing import Optional
+from collections import deque
+from functools import partial
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 import plotly.offline as py
 import plotly.graph_objs as go
 
-from simple_portfolio.adaptive_filters import lms, error_signal_lms, rls
+from simple_portfolio.adaptive_filters import AdaptiveFilter, LMSFilter, RLSFilter, SignLMSFilter, process_segments
+from simple_portfolio.feature_cache import FEATURE_CACHE
+from simple_portfolio.indicator_result import IndicatorResult
+from simple_portfolio.pipeline import IndicatorGraph
+from simple_portfolio.segments import AssetSegments, asset_pace, asset_paces, segment_rolling, segments_fingerprint
+from simple_portfolio.utils import bar_asset, bar_datetime
+
+# Columns of `BollingerBands.result`.
+BANDS_COLUMNS = ('TP', 'std_dev', 'band_center', 'band_upper', 'band_lower', 'long_term_std')
+
+
+class _RollingMoments:
+    """
+    Mean and sample standard deviation of the last `window` values, updated in O(1) per value.
+
+    Uses Welford's algorithm with removals, as pandas' rolling variance does, so the statistics match
+    `pd.Series.rolling(window)` up to rounding.
+    """
+    def __init__(self, window: int, values: Iterable[float]) -> None:
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        self.squared_deviations = 0.0
+
+        values = list(values)
+        for value in values[max(len(values) - window, 0):]:
+            self.add(value)
+
+    def add(self, value: float, removed: Optional[float] = None) -> None:
+        """Add `value`, dropping `removed`, the value leaving the window (if it is full)."""
+        if removed is not None:
+            self.count -= 1
+            delta = removed - self.mean
+            self.mean -= delta / self.count
+            self.squared_deviations -= delta * (removed - self.mean)
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squared_deviations += delta * (value - self.mean)
+
+    def get_mean(self) -> float:
+        return self.mean if self.count >= self.window else np.nan
+
+    def get_std(self) -> float:
+        if self.count < max(self.window, 2):
+            return np.nan
+
+        return np.sqrt(max(self.squared_deviations, 0.0) / (self.count - 1))
 
 
 class BollingerBands:
+    """
+    Bollinger Bands over the typical price.
+
+    The computed columns are kept in `self.result`, aligned to `self.quotes`, which are left untouched.
+
+    Quotes of several assets are computed per asset: the rolling windows (and adaptive filters, and their default
+    pace) of an asset only see its own bars, and all assets are computed together, in vectorized passes over
+    `self.segments`.
+
+    The columns are nodes of an `IndicatorGraph` (TP -> rolling std -> bands -> signal), and only the ones
+    named in `columns` (by default, all of `BANDS_COLUMNS`) are kept in `self.result`: the others are freed as
+    soon as the signals are computed, e.g. `columns=()` keeps only `self.signals`. Indicators built on the same
+    `graph` share the nodes computed from the same quotes and dtype (e.g. the rolling statistics of a sweep over
+    `deviations`), and are only computed when the graph is evaluated, or when one of them is first used.
+
+    Passing the output of `get_checkpoint` as `checkpoint` resumes the indicator from where it stopped:
+    only the bars of `quotes` after the checkpoint are processed (and kept in `self.quotes`), so updating
+    the indicator with new bars costs O(new bars) instead of recomputing the whole history.
+
+    The computed columns and adaptive filters use `dtype`, by default the dtype of the quotes' prices (see
+    `utils.process_profitchart_data`).
+
+    For live use, `update` continues the indicator one bar at a time, in constant time per bar.
+    """
     def __init__(
         self,
         quotes: pd.DataFrame,
         num_periods: int,
         deviations: float,
-        long_periods: int = 60
+        long_periods: int = 60,
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
         assert isinstance(quotes, pd.DataFrame), "Quotes object should be a DataFrame."
 
+        if checkpoint is not None:
+            quotes = quotes[quotes.index.get_level_values('datetime') > checkpoint['index']]
+            assert len(quotes) > 0, "No quotes after the checkpoint."
+
         self.num_periods = num_periods
         self.deviations = deviations
         self.long_periods = long_periods
-        self.quotes = self._construct_bands(quotes)
-        self.signals = self._make_signals()
-
-    def _construct_bands(self, quotes: pd.DataFrame) -> pd.DataFrame:
+        self.dtype = np.dtype(quotes['close'].dtype if dtype is None else dtype).name
+        self.columns = BANDS_COLUMNS if columns is None else tuple(columns)
+        assert set(self.columns) <= set(BANDS_COLUMNS), f"Columns should be among {BANDS_COLUMNS}."
+        # Typical prices of each asset before the first quote, which its rolling windows start from.
+        self._lookbacks = {} if checkpoint is None else {
+            asset: np.asarray(state['TP']) for asset, state in checkpoint['assets'].items()
+        }
+        self.quotes = quotes
+        self.segments = AssetSegments(quotes.index)
+        self._result = IndicatorResult(quotes.index)
+        self._signals = None
+        self.graph = IndicatorGraph() if graph is None else graph
+        self.graph.request(self._add_nodes(self.graph, checkpoint))
+        if graph is None:
+            self.graph.evaluate()
+
+    @property
+    def result(self) -> IndicatorResult:
+        self._evaluate()
+        return self._result
+
+    @property
+    def signals(self) -> pd.DataFrame:
+        self._evaluate()
+        return self._signals
+
+    def _evaluate(self) -> None:
+        """Evaluate the indicator's graph, if it is a shared one that was not evaluated yet."""
+        if self._signals is None:
+            self.graph.evaluate()
+
+    def _add_nodes(self, graph: IndicatorGraph, checkpoint: Optional[Dict]) -> Hashable:
+        """Add the indicator's columns and signals to `graph`, returning the node that hands them to it."""
         # Standard Bolling Bands Algorithm
-        quotes['TP'] = quotes.eval("(high + low + close) / 3")
-
-        quotes['std_dev'] = quotes['TP'].rolling(self.num_periods).std()
+        source = (graph.token(self.quotes), self.dtype)
+        typical_price = graph.add(source + ('TP',), self._typical_price)
+        windows = graph.add((typical_price, 'windows'), self._typical_price_windows, (typical_price,))
+        num_lookback = max(self.num_periods, self.long_periods)
+        tails = graph.add(
+            (windows, 'tails', num_lookback), partial(self._typical_price_tails, num_lookback), (windows,)
+        )
 
-        quotes['band_center'] = self._get_band_center(quotes)
-        quotes['band_upper'] = quotes['band_center'] + self.deviations * quotes['std_dev']
-        quotes['band_lower'] = quotes['band_center'] - self.deviations * quotes['std_dev']
+        nodes = {'TP': typical_price, 'std_dev': self._add_rolling(graph, windows, self.num_periods, 'std')}
+        nodes['band_center'] = self._add_band_center(graph, typical_price, windows, checkpoint)
+        for name, sign in (('band_upper', 1), ('band_lower', -1)):
+            nodes[name] = graph.add(
+                (nodes['band_center'], nodes['std_dev'], name, self.deviations),
+                partial(self._band, sign * self.deviations), (nodes['band_center'], nodes['std_dev'])
+            )
 
         # Long term rolling standard deviation, used to evaluate "consolidation periods".
-        quotes['long_term_std'] = quotes['TP'].rolling(self.long_periods).std()
+        nodes['long_term_std'] = self._add_rolling(graph, windows, self.long_periods, 'std')
 
-        return quotes
+        signal_inputs = tuple(nodes[name] for name in ('band_upper', 'band_lower', 'std_dev', 'long_term_std'))
+        signal = graph.add(signal_inputs + ('signal',), self._make_signals, signal_inputs)
 
-    def _get_band_center(self, quotes: pd.DataFrame) -> pd.Series:
-        return quotes['TP'].rolling(self.num_periods).mean()
+        return graph.add(
+            ('finish', graph.token(self)), self._finish, (tails, signal) + tuple(nodes[name] for name in self.columns)
+        )
+
+    def _typical_price(self) -> np.ndarray:
+        quotes = self.quotes
+        typical_price = (quotes['high'].values + quotes['low'].values + quotes['close'].values) / 3
+
+        return typical_price.astype(self.dtype, copy=False)
+
+    def _typical_price_windows(self, typical_price: np.ndarray) -> Tuple[np.ndarray, np.ndarray, str]:
+        """
+        Typical prices the rolling windows run over, one segment per asset starting with its lookback, the
+        offsets of the segments and their key in the feature cache.
+        """
+        windows, offsets = self.segments.with_lookback(
+            self.segments.gather(typical_price).astype(float, copy=False),
+            [self._lookbacks.get(asset, np.zeros(0)) for asset in self.segments.assets]
+        )
+
+        return windows, offsets, segments_fingerprint(windows, offsets)
+
+    def _typical_price_tails(self, num_lookback: int, windows: Tuple[np.ndarray, np.ndarray, str]) -> List:
+        """Last `num_lookback` typical prices of each asset, which `update` continues from."""
+        typical_price, offsets, _ = windows
+
+        return [typical_price[max(start, stop - num_lookback):stop].copy() for start, stop in zip(offsets, offsets[1:])]
+
+    def _add_rolling(self, graph: IndicatorGraph, windows: Hashable, num_periods: int, statistic: str) -> Hashable:
+        return graph.add(
+            (windows, 'rolling_' + statistic, num_periods),
+            partial(self._rolling_typical_price, num_periods, statistic), (windows,)
+        )
+
+    def _rolling_typical_price(
+        self,
+        num_periods: int,
+        statistic: str,
+        windows: Tuple[np.ndarray, np.ndarray, str]
+    ) -> np.ndarray:
+        """
+        Rolling `statistic` of the typical prices of the quotes, with windows continued from the lookback.
+
+        Shared through the feature cache with the other indicators built over the same typical prices.
+        """
+        typical_price, offsets, key = windows
+        statistics = FEATURE_CACHE.get(
+            (key, 'TP', 'rolling_' + statistic, num_periods),
+            lambda: segment_rolling(typical_price, offsets, num_periods, statistic)
+        )
+        statistics = self.segments.without_lookback(statistics, offsets)
 
-    def _make_signals(self):
-        quotes = self.quotes.copy()
+        return self.segments.scatter(statistics).astype(self.dtype, copy=False)
 
-        quotes['signal_short'] = quotes.eval('high >= band_upper').astype(int)
-        quotes['signal_long'] = quotes.eval('low <= band_lower').astype(int)
+    def _add_band_center(
+        self,
+        graph: IndicatorGraph,
+        typical_price: Hashable,
+        windows: Hashable,
+        checkpoint: Optional[Dict]
+    ) -> Hashable:
+        return self._add_rolling(graph, windows, self.num_periods, 'mean')
+
+    @staticmethod
+    def _band(deviations: float, band_center: np.ndarray, std_dev: np.ndarray) -> np.ndarray:
+        return band_center + deviations * std_dev
+
+    def _make_signals(
+        self,
+        band_upper: np.ndarray,
+        band_lower: np.ndarray,
+        std_dev: np.ndarray,
+        long_term_std: np.ndarray
+    ) -> np.ndarray:
+        signal_short = (self.quotes['high'].values >= band_upper).astype(int)
+        signal_long = (self.quotes['low'].values <= band_lower).astype(int)
         # In practice, this only has an impact in very high volatility situations.
         # In those situations, it might be relevant not to trade at all, as we don't have a good
         # estimate of in which direction the market "will move"
-        quotes['signal'] = quotes['signal_long'] - quotes['signal_short']
+        signal = signal_long - signal_short
+
+        high_volatility = std_dev >= 0.5 * long_term_std
+
+        return signal * high_volatility
 
-        quotes['high_volatility'] = quotes['std_dev'] >= 0.5 * quotes['long_term_std']
-        quotes['signal'] = quotes['signal'] * quotes['high_volatility']
+    def _finish(self, tails: List, signal: np.ndarray, *columns: np.ndarray) -> None:
+        for name, values in zip(self.columns, columns):
+            self._result[name] = values
+        self._signals = pd.DataFrame({'signal': signal}, index=self.quotes.index)
+        self._start_stream(tails)
 
-        return quotes[['signal']]
+    def _start_stream(self, tails: List) -> None:
+        """Running state of `update` of each asset, after the last bar of `self.quotes`."""
+        num_lookback = max(self.num_periods, self.long_periods)
+
+        self._last_index = self.quotes.index.get_level_values('datetime')[-1].to_datetime64()
+        # Assets of the checkpoint without new quotes keep their state.
+        self._streams = {
+            asset: self._new_stream(lookback[-num_lookback:]) for asset, lookback in self._lookbacks.items()
+        }
+        for asset, typical_prices in zip(self.segments.assets, tails):
+            self._streams[asset] = self._new_stream(typical_prices)
+
+    def _new_stream(self, typical_prices: np.ndarray) -> Dict:
+        """Last typical prices of an asset and their rolling moments."""
+        return {
+            'TP': deque(typical_prices, maxlen=max(self.num_periods, self.long_periods)),
+            'moments': {
+                'std_dev': _RollingMoments(self.num_periods, typical_prices),
+                'long_term_std': _RollingMoments(self.long_periods, typical_prices)
+            }
+        }
+
+    def _next_band_center(self, asset: str, previous_typical_price: float, typical_price: float) -> float:
+        return self._streams[asset]['moments']['std_dev'].get_mean()
+
+    def update(self, bar: pd.Series) -> Dict:
+        """
+        Continue the indicator with the bar following the last one seen, e.g. a row of quotes.
+
+        Returns the bar's indicator columns, as in `self.result`, and its 'signal', as in `self.signals`,
+        matching the batch computation up to rounding. `self.result` and `self.signals` keep the bars the
+        indicator was built with, and `get_checkpoint` resumes after the last updated bar.
+
+        A bar of an asset without previous bars starts the asset's state, as its first bar in the quotes would.
+        """
+        self._evaluate()
+        cast = np.dtype(self.dtype).type
+        asset = bar_asset(bar)
+        stream = self._streams.setdefault(asset, self._new_stream(np.zeros(0)))
+        typical_prices, moments = stream['TP'], stream['moments']
+        typical_price = cast((bar['high'] + bar['low'] + bar['close']) / 3)
+        previous_typical_price = typical_prices[-1] if typical_prices else cast(bar['open'])
+
+        for window_moments in moments.values():
+            full = len(typical_prices) >= window_moments.window
+            window_moments.add(typical_price, typical_prices[-window_moments.window] if full else None)
+        typical_prices.append(typical_price)
+        self._last_index = bar_datetime(bar)
+
+        values = {
+            'TP': typical_price,
+            'std_dev': cast(moments['std_dev'].get_std()),
+            'band_center': cast(self._next_band_center(asset, previous_typical_price, typical_price)),
+            'long_term_std': cast(moments['long_term_std'].get_std())
+        }
+        values['band_upper'] = values['band_center'] + self.deviations * values['std_dev']
+        values['band_lower'] = values['band_center'] - self.deviations * values['std_dev']
+
+        signal = int(bar['low'] <= values['band_lower']) - int(bar['high'] >= values['band_upper'])
+        values['signal'] = signal * int(values['std_dev'] >= 0.5 * values['long_term_std'])
+
+        return values
+
+    def get_checkpoint(self) -> Dict:
+        """State needed to resume the indicator on the bars following the last one seen."""
+        self._evaluate()
+        return {
+            'index': self._last_index,
+            'assets': {asset: {'TP': np.array(stream['TP'])} for asset, stream in self._streams.items()}
+        }
 
     def plot_candlesticks(self, filename: str, last: int = 60):
         quotes = self.quotes
@@ -99,39 +363,112 @@ class IdealBands(BollingerBands):
         num_periods: int,
         deviations: float,
         long_periods: int = 60,
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
-        super().__init__(quotes, num_periods, deviations, long_periods)
+        super().__init__(quotes, num_periods, deviations, long_periods, checkpoint, dtype, columns, graph)
+
+    def _add_band_center(
+        self,
+        graph: IndicatorGraph,
+        typical_price: Hashable,
+        windows: Hashable,
+        checkpoint: Optional[Dict]
+    ) -> Hashable:
+        return graph.add((typical_price, 'ideal_center'), self._ideal_center, (typical_price,))
 
-    def _get_band_center(self, quotes: pd.DataFrame) -> pd.Series:
-        predictions = quotes['TP'].shift(-1).values
-        predictions[-1] = quotes.iloc[-1]['close']
+    def _ideal_center(self, typical_price: np.ndarray) -> np.ndarray:
+        # Each asset's band is centered on its next typical price, and its last one on its last close.
+        segments = self.segments
+        predictions = np.roll(segments.gather(typical_price), -1)
+        predictions[segments.ends] = segments.gather(self.quotes['close'].values)[segments.ends]
 
-        return predictions
+        return segments.scatter(predictions)
 
+    def update(self, bar: pd.Series) -> Dict:
+        raise NotImplementedError("Ideal bands are centered on the next bar, which is unknown when streaming.")
 
-class LMSBands(BollingerBands):
+
+class AdaptiveBands(BollingerBands):
+    """Bollinger Bands centered on an adaptive filter's one step ahead prediction of the typical price."""
+    def _new_filter(self, asset: str) -> AdaptiveFilter:
+        raise NotImplementedError
+
+    def _asset_filter(self, asset: str) -> AdaptiveFilter:
+        if asset not in self.filters:
+            self.filters[asset] = self._new_filter(asset)
+
+        return self.filters[asset]
+
+    def _add_band_center(
+        self,
+        graph: IndicatorGraph,
+        typical_price: Hashable,
+        windows: Hashable,
+        checkpoint: Optional[Dict]
+    ) -> Hashable:
+        # One filter per asset, so the band center is the indicator's own.
+        self.filters = {} if checkpoint is None else {
+            asset: AdaptiveFilter.from_state(state['filter'], history=None)
+            for asset, state in checkpoint['assets'].items()
+        }
+
+        return graph.add(('band_center', graph.token(self)), self._adaptive_center, (typical_price,))
+
+    def _adaptive_center(self, typical_price: np.ndarray) -> np.ndarray:
+        segments = self.segments
+        reference = segments.gather(typical_price)
+        entry = np.roll(reference, 1)
+        # The first entry of an asset is its last typical price before the quotes, or else its first open.
+        entry[segments.starts] = [
+            self._lookbacks[asset][-1] if asset in self._lookbacks else first_open
+            for asset, first_open in zip(
+                segments.assets, segments.gather(self.quotes['open'].values)[segments.starts]
+            )
+        ]
+
+        estimate = process_segments(
+            [self._asset_filter(asset) for asset in segments.assets], entry, reference, segments.offsets
+        )
+        return segments.scatter(estimate)
+
+    def _next_band_center(self, asset: str, previous_typical_price: float, typical_price: float) -> float:
+        estimate, _ = self._asset_filter(asset).process([previous_typical_price], [typical_price])
+
+        return estimate[0]
+
+    def get_checkpoint(self) -> Dict:
+        checkpoint = super().get_checkpoint()
+        for asset, state in checkpoint['assets'].items():
+            state['filter'] = self.filters[asset].get_state()
+
+        return checkpoint
+
+
+class LMSBands(AdaptiveBands):
     def __init__(
         self,
         quotes: pd.DataFrame,
         num_periods: int,
         deviations: float,
         long_periods: int = 60,
-        pace: Optional[float] = None
+        pace: Union[float, Dict[str, float], None] = None,
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
-        if pace is None:
-            signal = quotes.eval("(high + low + close) / 3").values
-            pace = signal.var() / np.correlate(signal, signal, 'valid')
+        # When resuming, the pace is restored with the filter. By default, each asset gets its own.
+        if pace is None and checkpoint is None:
+            pace = asset_paces(quotes)
         self.pace = pace
 
-        super().__init__(quotes, num_periods, deviations, long_periods)
-
-    def _get_band_center(self, quotes: pd.DataFrame) -> pd.Series:
-        entry = quotes['TP'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['TP'].values
+        super().__init__(quotes, num_periods, deviations, long_periods, checkpoint, dtype, columns, graph)
 
-        lms_estimate, _ = lms(entry, reference, self.num_periods, self.pace)
-        return lms_estimate
+    def _new_filter(self, asset: str) -> AdaptiveFilter:
+        return LMSFilter(self.num_periods, asset_pace(self.pace, asset), history=None, dtype=self.dtype)
 
 
 class ESBands(LMSBands):
@@ -141,20 +478,19 @@ class ESBands(LMSBands):
         num_periods: int,
         deviations: float,
         long_periods: int = 60,
-        pace: Optional[float] = None
+        pace: Union[float, Dict[str, float], None] = None,
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
-        super().__init__(quotes, num_periods, deviations, long_periods, pace)
+        super().__init__(quotes, num_periods, deviations, long_periods, pace, checkpoint, dtype, columns, graph)
 
-    def _get_band_center(self, quotes: pd.DataFrame) -> pd.Series:
-        entry = quotes['TP'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['TP'].values
+    def _new_filter(self, asset: str) -> AdaptiveFilter:
+        return SignLMSFilter(self.num_periods, asset_pace(self.pace, asset), history=None, dtype=self.dtype)
 
-        lms_estimate, _ = error_signal_lms(entry, reference, self.num_periods, self.pace)
-        return lms_estimate
 
-
-class RLSBands(BollingerBands):
+class RLSBands(AdaptiveBands):
     def __init__(
         self,
         quotes: pd.DataFrame,
@@ -163,16 +499,17 @@ class RLSBands(BollingerBands):
         lamb: float,
         sigma: float,
         long_periods: int = 60,
+        method: str = 'standard',
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
         self.lamb = lamb
         self.sigma = sigma
+        self.method = method
 
-        super().__init__(quotes, num_periods, deviations, long_periods)
-
-    def _get_band_center(self, quotes: pd.DataFrame) -> pd.Series:
-        entry = quotes['TP'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['TP'].values
+        super().__init__(quotes, num_periods, deviations, long_periods, checkpoint, dtype, columns, graph)
 
-        lms_estimate, _ = rls(entry, reference, self.num_periods, self.lamb, self.sigma)
-        return lms_estimate
+    def _new_filter(self, asset: str) -> AdaptiveFilter:
+        return RLSFilter(self.num_periods, self.lamb, self.sigma, self.method, history=None, dtype=self.dtype)
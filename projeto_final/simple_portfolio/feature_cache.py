@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from hashlib import sha1
+from typing import Callable, Hashable, Tuple
+
+import numpy as np
+
+# Default memory budget of the shared cache, in bytes.
+MAX_BYTES = 256 * 2 ** 20
+
+
+def fingerprint(values: np.ndarray) -> str:
+    """Digest of an array's dtype, shape and contents, which identifies it in a `FeatureCache`."""
+    values = np.ascontiguousarray(values)
+    digest = sha1(f'{values.dtype.str}{values.shape}'.encode())
+    digest.update(values.data)
+
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Least recently used cache of the arrays computed by the indicators, within a memory budget.
+
+    Keys are tuples like `(fingerprint(values), column, operation, window)`, so indicators built over the
+    same data (e.g. a sweep over the `deviations` of `BollingerBands`) reuse each other's rolling statistics
+    and moving averages. Arrays are copied in and out, so callers may modify what they get.
+    """
+    def __init__(self, max_bytes: int = MAX_BYTES) -> None:
+        self._entries = OrderedDict()
+        self._max_bytes = max_bytes
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int) -> None:
+        """Change the budget, evicting the least recently used arrays that no longer fit. 0 disables the cache."""
+        self._max_bytes = max_bytes
+        self._evict(0)
+
+    def _evict(self, num_bytes: int) -> None:
+        """Evict the least recently used arrays until `num_bytes` more fit in the budget."""
+        while self._entries and self.num_bytes + num_bytes > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.num_bytes -= evicted.nbytes
+
+    def get(self, key: Tuple[Hashable, ...], compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Array cached under `key`, calling `compute` to make it on a miss."""
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key].copy()
+
+        self.misses += 1
+        values = np.asarray(compute())
+        if values.nbytes <= self._max_bytes:
+            self._evict(values.nbytes)
+            self._entries[key] = values.copy()
+            self.num_bytes += values.nbytes
+
+        return values
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.num_bytes = 0
+
+
+# Cache shared by all the indicators.
+FEATURE_CACHE = FeatureCache()
@@ -0,0 +1,48 @@
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+class IndicatorResult:
+    """
+    Columns computed by an indicator, as numpy arrays aligned to the index of its quotes.
+
+    Only the computed columns are stored, never a copy of the quotes themselves, so the memory of an
+    indicator grows with the columns it adds. `to_frame` builds a DataFrame when one is needed, e.g.
+    `quotes.join(indicator.result.to_frame())` to look at the quotes and the indicator side by side.
+    """
+    def __init__(self, index: pd.Index, columns: Optional[Dict[str, np.ndarray]] = None) -> None:
+        self.index = index
+        self.columns = {}
+        for name, values in (columns or {}).items():
+            self[name] = values
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, values: Union[List, np.ndarray]) -> None:
+        values = np.asarray(values)
+        assert values.shape == (len(self.index),), \
+            f"Column {name} has shape {values.shape}, should be aligned to the {len(self.index)} quotes."
+
+        self.columns[name] = values
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.columns.values())
+
+    def to_frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """DataFrame of the given (by default, all) columns, indexed like the quotes."""
+        names = list(self.columns) if columns is None else columns
+
+        return pd.DataFrame({name: self.columns[name] for name in names}, index=self.index)
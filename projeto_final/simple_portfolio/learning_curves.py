@@ -0,0 +1,153 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from simple_portfolio.adaptive_filters import error_signal_lms, lms, rls
+
+NOISE_TYPES = (
+    'gaussian',
+    'impulsive',
+)
+
+# Filters that accept (R, N) signals, running one independent filter per realization.
+ENSEMBLE_FILTERS = {
+    ensemble_filter.__name__: ensemble_filter for ensemble_filter in (lms, error_signal_lms, rls)
+}
+
+
+def _realization_seeds(num_realizations: int, seed: Optional[int]) -> List[np.random.SeedSequence]:
+    """One independent seed per realization, so realization `r` is the same whatever R and the sharding."""
+    return np.random.SeedSequence(seed).spawn(num_realizations)
+
+
+def _identification_realizations(
+    system: np.ndarray,
+    seeds: Sequence[np.random.SeedSequence],
+    num_samples: int,
+    noise: str,
+    noise_std: float,
+    impulse_probability: float,
+    impulse_std: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    signals = np.empty((len(seeds), num_samples))
+    noises = np.empty((len(seeds), num_samples))
+    for realization, realization_seed in enumerate(seeds):
+        generator = np.random.default_rng(realization_seed)
+        signals[realization] = generator.standard_normal(num_samples)
+        noises[realization] = noise_std * generator.standard_normal(num_samples)
+        if noise == 'impulsive':
+            impulses = generator.random(num_samples) < impulse_probability
+            noises[realization] += impulses * impulse_std * generator.standard_normal(num_samples)
+
+    # Output of the unknown FIR system for every realization at once, as the filters see it (zero initial state).
+    padded = np.concatenate([np.zeros((len(seeds), system.shape[0] - 1)), signals], axis=1)
+    windows = sliding_window_view(padded, system.shape[0], axis=1)
+    references = windows @ system[::-1] + noises
+
+    return signals, references
+
+
+def identification_data(
+    system: Union[List, np.ndarray],
+    num_realizations: int,
+    num_samples: int,
+    noise: str = 'gaussian',
+    noise_std: float = 0.1,
+    impulse_probability: float = 0.01,
+    impulse_std: float = 10.0,
+    seed: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate `num_realizations` runs of a system identification problem.
+
+    Each realization drives the FIR `system` with unit variance white Gaussian noise `x` and observes
+    `d = system * x + v`, with Gaussian measurement noise `v` of standard deviation `noise_std`. With
+    `noise='impulsive'`, `v` also has Gaussian impulses of standard deviation `impulse_std` at a rate of
+    `impulse_probability` per sample. Returns the (R, N) signals and references.
+    """
+    assert noise in NOISE_TYPES, f"Invalid noise type {noise}. Should be one of {NOISE_TYPES}."
+
+    return _identification_realizations(
+        np.asarray(system, dtype=float), _realization_seeds(num_realizations, seed), num_samples, noise,
+        noise_std, impulse_probability, impulse_std
+    )
+
+
+def _squared_errors(
+    filter_name: str,
+    system: np.ndarray,
+    seeds: Sequence[np.random.SeedSequence],
+    num_samples: int,
+    noise_options: Dict,
+    filter_options: Dict
+) -> np.ndarray:
+    """Squared a priori errors of the filter on the realizations of `seeds`, one row per realization."""
+    signals, references = _identification_realizations(system, seeds, num_samples, **noise_options)
+    estimates, _ = ENSEMBLE_FILTERS[filter_name](signals, references, history=None, **filter_options)
+
+    return np.square(references - estimates)
+
+
+def learning_curves(
+    filter_name: str,
+    system: Union[List, np.ndarray],
+    num_realizations: int,
+    num_samples: int,
+    num_parameters: Optional[int] = None,
+    noise: str = 'gaussian',
+    noise_std: float = 0.1,
+    impulse_probability: float = 0.01,
+    impulse_std: float = 10.0,
+    quantiles: Sequence[float] = (0.1, 0.5, 0.9),
+    seed: Optional[int] = None,
+    num_workers: int = 1,
+    **filter_options
+) -> Dict[str, np.ndarray]:
+    """
+    Monte Carlo learning curves of an adaptive filter identifying `system`.
+
+    The realizations of `identification_data` are filtered together, as the channels of a multichannel
+    call to the filter in `ENSEMBLE_FILTERS` named `filter_name`, with `filter_options` (e.g. `pace`, or
+    `fading` and `sigma`) passed to it. The filter has `len(system)` parameters unless `num_parameters`
+    is given.
+
+    Returns the (N,) mean squared error curve as 'mse' and its (Q, N) `quantiles` across realizations as
+    'quantiles'. With `num_workers > 1` the realizations are split into that many shards, each simulated
+    and filtered in its own process. Every realization draws from its own random stream derived from
+    `seed`, so the curves do not depend on the number of workers.
+    """
+    assert filter_name in ENSEMBLE_FILTERS, \
+        f"Invalid filter {filter_name}. Should be one of {tuple(ENSEMBLE_FILTERS)}."
+    assert noise in NOISE_TYPES, f"Invalid noise type {noise}. Should be one of {NOISE_TYPES}."
+
+    system = np.asarray(system, dtype=float)
+    filter_options['num_parameters'] = system.shape[0] if num_parameters is None else num_parameters
+    noise_options = {
+        'noise': noise,
+        'noise_std': noise_std,
+        'impulse_probability': impulse_probability,
+        'impulse_std': impulse_std
+    }
+
+    seeds = _realization_seeds(num_realizations, seed)
+    if num_workers > 1:
+        shards = [
+            [seeds[realization] for realization in shard]
+            for shard in np.array_split(np.arange(num_realizations), num_workers) if shard.shape[0] > 0
+        ]
+        shard_errors = partial(
+            _squared_errors, filter_name, system, num_samples=num_samples, noise_options=noise_options,
+            filter_options=filter_options
+        )
+        with ProcessPoolExecutor(len(shards)) as executor:
+            squared_errors = np.concatenate(list(executor.map(shard_errors, shards)))
+    else:
+        squared_errors = _squared_errors(filter_name, system, seeds, num_samples, noise_options, filter_options)
+
+    return {
+        'mse': squared_errors.mean(axis=0),
+        'quantiles': np.quantile(squared_errors, quantiles, axis=0)
+    }
@@ -1,51 +1,417 @@
-from typing import Optional
+from copy import deepcopy
+from functools import partial
+from operator import itemgetter
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
-from simple_portfolio.adaptive_filters import lms, error_signal_lms, rls
+from simple_portfolio.adaptive_filters import AdaptiveFilter, LMSFilter, RLSFilter, SignLMSFilter, process_orders
+from simple_portfolio.feature_cache import FEATURE_CACHE
+from simple_portfolio.indicator_result import IndicatorResult
+from simple_portfolio.pipeline import IndicatorGraph
+from simple_portfolio.segments import AssetSegments, asset_pace, asset_paces, segment_ewm_mean, segments_fingerprint
+from simple_portfolio.utils import bar_asset, bar_datetime
+
+# Columns of `MACD.result`.
+MACD_COLUMNS = ('short_ma', 'long_ma', 'macd', 'signal_line', 'relative_signal')
+
+
+def _ewm_mean(
+    values: np.ndarray,
+    span: int,
+    offsets: np.ndarray,
+    states: Optional[List[Optional[Dict]]] = None,
+    key: Optional[Tuple[str, str]] = None
+) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    `pd.Series(segment).ewm(span=span).mean()` of every segment of `values` (cut at `offsets`), each continued
+    from its state in `states` if given (and not None).
+
+    The (adjusted) exponential moving average is the ratio of two exponentially weighted sums, of the values
+    and of ones, which are returned as the state of each segment after its last value. With a `key`, the
+    `(fingerprint, column)` of `values` and `offsets`, the pandas averages are shared through the feature cache.
+    """
+    decay = 1 - 2 / (span + 1)
+    if key is None:
+        means = segment_ewm_mean(values, offsets, span)
+    else:
+        means = FEATURE_CACHE.get(key + ('ewm', span), lambda: segment_ewm_mean(values, offsets, span))
+    lengths = np.diff(offsets)
+    segment_ids = np.repeat(np.arange(lengths.shape[0]), lengths)
+    # Number of values of its segment up to each value.
+    counts = np.arange(1, means.shape[0] + 1) - np.repeat(offsets[:-1], lengths)
+    # Sum of the weights of the values so far, decay^0 + ... + decay^t.
+    denominator = (1 - decay ** counts) / (1 - decay)
+
+    if states is not None and any(state is not None for state in states):
+        is_resumed = np.array([state is not None for state in states])[segment_ids]
+        numerators, denominators = (
+            np.array([0.0 if state is None else state[name] for state in states])[segment_ids]
+            for name in ('numerator', 'denominator')
+        )
+        carried_decay = decay ** counts
+        numerator = means * denominator + carried_decay * numerators
+        denominator = denominator + carried_decay * denominators
+        means = np.where(is_resumed, numerator / denominator, means)
+
+    ends = offsets[1:] - 1
+    return means, [
+        {'numerator': mean * weights, 'denominator': weights} for mean, weights in zip(means[ends], denominator[ends])
+    ]
 
 
 class MACD:
+    """
+    Moving average convergence divergence indicator.
+
+    The computed columns are kept in `self.result`, aligned to `self.quotes`, which are left untouched.
+
+    Quotes of several assets are computed per asset: the moving averages (and adaptive filters, and their default
+    pace) of an asset only see its own bars, and all assets are computed together, in vectorized passes over
+    `self.segments`.
+
+    The columns are nodes of an `IndicatorGraph`, and only the ones named in `columns` (by default, all of
+    `MACD_COLUMNS`) are kept in `self.result`, as in `bollinger.BollingerBands`. Indicators built on the same
+    `graph` share the moving averages of the same quotes, dtype and span.
+
+    Passing the output of `get_checkpoint` as `checkpoint` resumes the indicator from where it stopped:
+    only the bars of `quotes` after the checkpoint are processed (and kept in `self.quotes`), so updating
+    the indicator with new bars costs O(new bars) instead of recomputing the whole history.
+
+    The computed columns and adaptive filters use `dtype`, by default the dtype of the quotes' prices (see
+    `utils.process_profitchart_data`).
+
+    For live use, `update` continues the indicator one bar at a time, in constant time per bar.
+    """
     def __init__(
         self,
         quotes: pd.DataFrame,
         short_periods: int,
         long_periods: int,
         signal_periods: int,
-        tolerance: float = 2e-1
+        tolerance: float = 2e-1,
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
         assert isinstance(quotes, pd.DataFrame), "Quotes object should be a DataFrame."
 
+        if checkpoint is not None:
+            quotes = quotes[quotes.index.get_level_values('datetime') > checkpoint['index']]
+            assert len(quotes) > 0, "No quotes after the checkpoint."
+
         self.short_periods = short_periods
         self.long_periods = long_periods
         self.signal_periods = signal_periods
         self.tolerance = tolerance
-        self.quotes = self._construct_indicator(quotes)
-        self.signals = self._make_signals()
+        self.dtype = np.dtype(quotes['close'].dtype if dtype is None else dtype).name
+        self.columns = MACD_COLUMNS if columns is None else tuple(columns)
+        assert set(self.columns) <= set(MACD_COLUMNS), f"Columns should be among {MACD_COLUMNS}."
+        # State of each asset at the checkpoint.
+        self._resumed = {} if checkpoint is None else checkpoint['assets']
+        self.quotes = quotes
+        self.segments = AssetSegments(quotes.index)
+        self._result = IndicatorResult(quotes.index)
+        self._signals = None
+        self.graph = IndicatorGraph() if graph is None else graph
+        self.graph.request(self._add_nodes(self.graph))
+        if graph is None:
+            self.graph.evaluate()
+
+    @property
+    def result(self) -> IndicatorResult:
+        self._evaluate()
+        return self._result
+
+    @property
+    def signals(self) -> pd.DataFrame:
+        self._evaluate()
+        return self._signals
+
+    def _evaluate(self) -> None:
+        """Evaluate the indicator's graph, if it is a shared one that was not evaluated yet."""
+        if self._signals is None:
+            self.graph.evaluate()
+
+    def _add_nodes(self, graph: IndicatorGraph) -> Hashable:
+        """Add the indicator's columns and signals to `graph`, returning the node that hands them to it."""
+        # Standard MACD Algorithm, over the gathered bars of each asset.
+        source = (graph.token(self.quotes), self.dtype)
+        averages = dict(zip(('short_ma', 'long_ma'), self._add_moving_averages(graph, source)))
+        nodes = {name: graph.add((average, 'column'), self._column, (average,)) for name, average in averages.items()}
+        nodes['macd'] = graph.add((nodes['short_ma'], nodes['long_ma'], 'macd'), np.subtract, tuple(nodes.values()))
+        averages['signal_line'] = self._add_signal_average(graph, nodes['macd'])
+        nodes['signal_line'] = graph.add((averages['signal_line'], 'column'), self._column, (averages['signal_line'],))
+        nodes['relative_signal'] = graph.add(
+            (nodes['macd'], nodes['signal_line'], 'relative_signal'), np.subtract, (nodes['macd'], nodes['signal_line'])
+        )
+
+        signal = graph.add(
+            (nodes['relative_signal'], 'signal', self.tolerance), self._make_signals, (nodes['relative_signal'],)
+        )
+        # What `update` continues from: the moving averages' states and the last bar of each asset.
+        states = tuple(graph.add((average, 'states'), itemgetter(1), (average,)) for average in averages.values())
+        last_bars = tuple(
+            graph.add((nodes[name], 'last'), self._last_bars, (nodes[name],)) for name in ('macd', 'relative_signal')
+        )
+
+        columns = tuple(nodes[name] for name in self.columns)
+        return graph.add(('finish', graph.token(self)), self._finish, (signal,) + states + last_bars + columns)
+
+    def _add_moving_averages(self, graph: IndicatorGraph, source: Hashable) -> Tuple[Hashable, Hashable]:
+        """Add the short and long moving averages of the close to `graph`."""
+        close = graph.add(source + ('close',), self._gathered_close)
+        close_key = graph.add((close, 'key'), partial(self._cache_key, 'close'), (close,))
+
+        return (
+            self._add_moving_average(graph, 'short_ma', close, self.short_periods, close_key),
+            self._add_moving_average(graph, 'long_ma', close, self.long_periods, close_key)
+        )
+
+    def _add_signal_average(self, graph: IndicatorGraph, macd: Hashable) -> Hashable:
+        """Add the moving average of the MACD, the signal line, to `graph`."""
+        macd_key = graph.add((macd, 'key'), partial(self._cache_key, 'macd'), (macd,))
+
+        return self._add_moving_average(graph, 'signal_line', macd, self.signal_periods, macd_key)
+
+    def _add_moving_average(
+        self,
+        graph: IndicatorGraph,
+        name: str,
+        values: Hashable,
+        span: int,
+        key: Optional[Hashable] = None
+    ) -> Hashable:
+        # Moving averages continued from a checkpoint are the `name` line's own.
+        node = (values, 'ewm', span) + ((name,) if self._resumed else ())
+
+        return graph.add(node, partial(self._moving_average, name, span), (values,) + (() if key is None else (key,)))
 
-    def _construct_indicator(self, quotes: pd.DataFrame) -> pd.DataFrame:
-        # Standard MACD Algorithm
-        quotes['short_ma'] = quotes['close'].ewm(span=self.short_periods).mean()
-        quotes['long_ma'] = quotes['close'].ewm(span=self.long_periods).mean()
-        quotes['macd'] = quotes['short_ma'] - quotes['long_ma']
-        quotes['signal_line'] = quotes['macd'].ewm(span=self.signal_periods).mean()
+    def _gathered_close(self) -> np.ndarray:
+        return self.segments.gather(self.quotes['close'].values.astype(self.dtype, copy=False))
 
-        quotes['relative_signal'] = quotes['macd'] - quotes['signal_line']
+    def _cache_key(self, column: str, values: np.ndarray) -> Tuple[str, str]:
+        return segments_fingerprint(values, self.segments.offsets), column
+
+    def _moving_average(
+        self,
+        name: str,
+        span: int,
+        values: np.ndarray,
+        key: Optional[Tuple[str, str]] = None
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        """Moving average of the gathered `values` (see `AssetSegments`) of each asset, and its states."""
+        states = [
+            self._resumed[asset]['ewm'][name] if asset in self._resumed else None for asset in self.segments.assets
+        ]
+
+        return _ewm_mean(values, span, self.segments.offsets, states, key)
+
+    def _column(self, average: Tuple[np.ndarray, List[Dict]]) -> np.ndarray:
+        return average[0].astype(self.dtype, copy=False)
+
+    def _last_bars(self, values: np.ndarray) -> np.ndarray:
+        return values[self.segments.ends]
+
+    def _make_signals(self, relative_signal: np.ndarray) -> np.ndarray:
+        segments = self.segments
+
+        is_small = np.abs(relative_signal) <= self.tolerance
+        relative_signal_change = np.empty_like(relative_signal)
+        relative_signal_change[1:] = np.diff(relative_signal)
+        # The first change of an asset is from its relative signal at the checkpoint, if any.
+        relative_signal_change[segments.starts] = [
+            relative_signal[start] - self._resumed[asset]['relative_signal'] if asset in self._resumed else 0
+            for asset, start in zip(segments.assets, segments.starts)
+        ]
+        relative_signal_change[np.isnan(relative_signal_change)] = 0
+        change_velocity = np.sign(relative_signal_change)
+
+        return segments.scatter(is_small * change_velocity)
+
+    def _finish(self, signal: np.ndarray, *values: np.ndarray) -> None:
+        states, last_bars, columns = values[:3], values[3:5], values[5:]
+        for name, column in zip(self.columns, columns):
+            self._result[name] = self.segments.scatter(column)
+        self._signals = pd.DataFrame({'signal': signal}, index=self.quotes.index)
+        self._start_stream(
+            dict(zip(('short_ma', 'long_ma', 'signal_line'), states)), dict(zip(('macd', 'relative_signal'), last_bars))
+        )
+
+    def _start_stream(self, ewm_states: Dict[str, List[Dict]], last_bars: Dict[str, np.ndarray]) -> None:
+        """Running state of `update` of each asset, after the last bar of `self.quotes`."""
+        self._last_index = self.quotes.index.get_level_values('datetime')[-1].to_datetime64()
+        # Assets of the checkpoint without new quotes keep their state.
+        self._last = {
+            asset: {name: deepcopy(state[name]) for name in ('close', 'macd', 'relative_signal', 'ewm')}
+            for asset, state in self._resumed.items()
+        }
+
+        segments = self.segments
+        last_bars = {'close': segments.gather(self.quotes['close'].values)[segments.ends], **last_bars}
+        for a, asset in enumerate(segments.assets):
+            self._last[asset] = {name: values[a] for name, values in last_bars.items()}
+            self._last[asset]['ewm'] = {name: states[a] for name, states in ewm_states.items()}
+
+    def _new_stream(self, bar: pd.Series) -> Dict:
+        """State of an asset before its first bar, as the batch computation starts it."""
+        first_entry = np.dtype(self.dtype).type(bar['open'])
+
+        return {
+            'close': first_entry,
+            'macd': first_entry,
+            'relative_signal': np.nan,
+            'ewm': {name: {'numerator': 0.0, 'denominator': 0.0} for name in ('short_ma', 'long_ma', 'signal_line')}
+        }
+
+    def _next_input(self, name: str, asset: str, previous: float, value: float) -> float:
+        """Value entering the moving average of the `name` ('short', 'long' or 'signal') line of `asset`."""
+        return value
+
+    def _next_moving_average(self, state: Dict, value: float, span: int) -> float:
+        # One step of the exponentially weighted sums of `_ewm_mean`.
+        decay = 1 - 2 / (span + 1)
+        state['numerator'] = value + decay * state['numerator']
+        state['denominator'] = 1 + decay * state['denominator']
+
+        return np.dtype(self.dtype).type(state['numerator'] / state['denominator'])
+
+    def update(self, bar: pd.Series) -> Dict:
+        """
+        Continue the indicator with the bar following the last one seen, e.g. a row of quotes.
+
+        Returns the bar's indicator columns, as in `self.result`, and its 'signal', as in `self.signals`,
+        matching the batch computation up to rounding. `self.result` and `self.signals` keep the bars the
+        indicator was built with, and `get_checkpoint` resumes after the last updated bar.
+
+        A bar of an asset without previous bars starts the asset's state, as its first bar in the quotes would.
+        """
+        self._evaluate()
+        asset = bar_asset(bar)
+        last = self._last.setdefault(asset, self._new_stream(bar))
+        ewm_states = last['ewm']
+        close = np.dtype(self.dtype).type(bar['close'])
+        values = {
+            'short_ma': self._next_moving_average(
+                ewm_states['short_ma'], self._next_input('short', asset, last['close'], close), self.short_periods
+            ),
+            'long_ma': self._next_moving_average(
+                ewm_states['long_ma'], self._next_input('long', asset, last['close'], close), self.long_periods
+            )
+        }
+        values['macd'] = values['short_ma'] - values['long_ma']
+        values['signal_line'] = self._next_moving_average(
+            ewm_states['signal_line'], self._next_input('signal', asset, last['macd'], values['macd']),
+            self.signal_periods
+        )
+        values['relative_signal'] = values['macd'] - values['signal_line']
+
+        is_small = abs(values['relative_signal']) <= self.tolerance
+        relative_signal_change = np.nan_to_num(values['relative_signal'] - last['relative_signal'])
+        values['signal'] = int(is_small) * int(np.sign(relative_signal_change))
+
+        last.update(close=close, macd=values['macd'], relative_signal=values['relative_signal'])
+        self._last_index = bar_datetime(bar)
+
+        return values
+
+    def get_checkpoint(self) -> Dict:
+        """State needed to resume the indicator on the bars following the last one seen."""
+        self._evaluate()
+        return {'index': self._last_index, 'assets': deepcopy(self._last)}
+
+
+class AdaptiveMACD(MACD):
+    """MACD whose moving averages are taken over adaptive filters' one step ahead predictions."""
+    def _new_filter(self, num_parameters: int, asset: str) -> AdaptiveFilter:
+        raise NotImplementedError
+
+    def _asset_filter(self, name: str, asset: str) -> AdaptiveFilter:
+        if asset not in self.filters[name]:
+            periods = {'short': self.short_periods, 'long': self.long_periods, 'signal': self.signal_periods}
+            self.filters[name][asset] = self._new_filter(periods[name], asset)
+
+        return self.filters[name][asset]
+
+    def _process_lines(self, names: Tuple[str, ...], entry: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        """
+        Estimates of the filters of the `names` lines of every asset, all advanced in a single pass (see
+        `process_orders`), as the short and long filters share their entry and reference.
+        """
+        filters = [[self._asset_filter(name, asset) for name in names] for asset in self.segments.assets]
+
+        return process_orders(filters, entry, reference, self.segments.offsets)
+
+    def _first_entries(self, name: str) -> List[float]:
+        """First entry of the filters of each asset: its `name` value at the checkpoint, or else its first open."""
+        segments = self.segments
+        first_opens = segments.gather(self.quotes['open'].values)[segments.starts]
+
+        return [
+            self._resumed[asset][name] if asset in self._resumed else first_open
+            for asset, first_open in zip(segments.assets, first_opens)
+        ]
+
+    def _add_moving_averages(self, graph: IndicatorGraph, source: Hashable) -> Tuple[Hashable, Hashable]:
+        # One filter per line and asset, so the moving averages are the indicator's own.
+        self.filters = {name: {} for name in ('short', 'long', 'signal')}
+        for asset, state in self._resumed.items():
+            for name, filter_state in state['filters'].items():
+                self.filters[name][asset] = AdaptiveFilter.from_state(filter_state, history=None)
+
+        estimates = graph.add(('estimates', graph.token(self), 'short', 'long'), self._close_estimates)
+        return tuple(
+            graph.add((estimates, 'ewm', name), partial(self._estimate_average, name, span, row), (estimates,))
+            for row, (name, span) in enumerate((('short_ma', self.short_periods), ('long_ma', self.long_periods)))
+        )
+
+    def _add_signal_average(self, graph: IndicatorGraph, macd: Hashable) -> Hashable:
+        estimates = graph.add(('estimates', graph.token(self), 'signal'), self._macd_estimates, (macd,))
+
+        return graph.add(
+            (estimates, 'ewm', 'signal_line'), partial(self._estimate_average, 'signal_line', self.signal_periods, 0),
+            (estimates,)
+        )
+
+    def _close_estimates(self) -> np.ndarray:
+        segments = self.segments
+        reference = segments.gather(self.quotes['close'].values)
+        entry = np.roll(reference, 1)
+        entry[segments.starts] = self._first_entries('close')
+
+        return self._process_lines(('short', 'long'), entry, reference)
+
+    def _macd_estimates(self, macd: np.ndarray) -> np.ndarray:
+        entry = np.roll(macd, 1)
+        entry[self.segments.starts] = self._first_entries('macd')
+
+        return self._process_lines(('signal',), entry, macd)
+
+    def _estimate_average(
+        self,
+        name: str,
+        span: int,
+        row: int,
+        estimates: np.ndarray
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        return self._moving_average(name, span, estimates[row])
 
-        return quotes
+    def _next_input(self, name: str, asset: str, previous: float, value: float) -> float:
+        estimate, _ = self._asset_filter(name, asset).process([previous], [value])
 
-    def _make_signals(self) -> pd.Series:
-        quotes = self.quotes.copy()
+        return estimate[0]
 
-        is_small = quotes['relative_signal'].abs() <= self.tolerance
-        change_velocity = np.sign(quotes['relative_signal'].diff().fillna(0))
-        quotes['signal'] = is_small * change_velocity
+    def get_checkpoint(self) -> Dict:
+        checkpoint = super().get_checkpoint()
+        for asset, state in checkpoint['assets'].items():
+            state['filters'] = {name: filters[asset].get_state() for name, filters in self.filters.items()}
 
-        return quotes[['signal']]
+        return checkpoint
 
 
-class LMS_MACD(MACD):
+class LMS_MACD(AdaptiveMACD):
     def __init__(
         self,
         quotes: pd.DataFrame,
@@ -53,40 +419,23 @@ class LMS_MACD(MACD):
         long_periods: int,
         signal_periods: int,
         tolerance: float = 2e-1,
-        pace: Optional[float] = None
+        pace: Union[float, Dict[str, float], None] = None,
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
-        if pace is None:
-            signal = quotes.eval("(high + low + close) / 3").values
-            pace = signal.var() / np.correlate(signal, signal, 'valid')
+        # When resuming, the pace is restored with the filters. By default, each asset gets its own.
+        if pace is None and checkpoint is None:
+            pace = asset_paces(quotes)
         self.pace = pace
 
-        super().__init__(quotes, short_periods, long_periods, signal_periods,  tolerance)
-
-    def _construct_indicator(self, quotes: pd.DataFrame) -> pd.Series:
-        entry = quotes['close'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['close'].values
-
-        estimate_short, _ = lms(entry, reference, self.short_periods, self.pace)
-        estimate_long, _ = lms(entry, reference, self.long_periods, self.pace)
-        estimate_short = pd.Series(estimate_short)
-        estimate_long = pd.Series(estimate_long)
-
-        quotes['short_ma'] = estimate_short.ewm(span=self.short_periods).mean()
-        quotes['long_ma'] = estimate_long.ewm(span=self.long_periods).mean()
-        quotes['macd'] = quotes['short_ma'] - quotes['long_ma']
+        super().__init__(
+            quotes, short_periods, long_periods, signal_periods,  tolerance, checkpoint, dtype, columns, graph
+        )
 
-        entry = quotes['macd'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['macd'].values
-
-        estimate_signal, _ = lms(entry, reference, self.signal_periods, self.pace)
-        estimate_signal = pd.Series(estimate_signal)
-
-        quotes['signal_line'] = estimate_signal.ewm(span=self.signal_periods).mean()
-        quotes['relative_signal'] = quotes['macd'] - quotes['signal_line']
-
-        return quotes
+    def _new_filter(self, num_parameters: int, asset: str) -> AdaptiveFilter:
+        return LMSFilter(num_parameters, asset_pace(self.pace, asset), history=None, dtype=self.dtype)
 
 
 class ES_MACD(LMS_MACD):
@@ -97,38 +446,21 @@ class ES_MACD(LMS_MACD):
         long_periods: int,
         signal_periods: int,
         tolerance: float = 2e-1,
-        pace: Optional[float] = None
+        pace: Union[float, Dict[str, float], None] = None,
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
-        super().__init__(quotes, short_periods, long_periods, signal_periods,  tolerance, pace)
-
-    def _construct_indicator(self, quotes: pd.DataFrame) -> pd.Series:
-        entry = quotes['close'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['close'].values
-
-        estimate_short, _ = error_signal_lms(entry, reference, self.short_periods, self.pace)
-        estimate_long, _ = error_signal_lms(entry, reference, self.long_periods, self.pace)
-        estimate_short = pd.Series(estimate_short)
-        estimate_long = pd.Series(estimate_long)
-
-        quotes['short_ma'] = estimate_short.ewm(span=self.short_periods).mean()
-        quotes['long_ma'] = estimate_long.ewm(span=self.long_periods).mean()
-        quotes['macd'] = quotes['short_ma'] - quotes['long_ma']
-
-        entry = quotes['macd'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['macd'].values
-
-        estimate_signal, _ = error_signal_lms(entry, reference, self.signal_periods, self.pace)
-        estimate_signal = pd.Series(estimate_signal)
+        super().__init__(
+            quotes, short_periods, long_periods, signal_periods,  tolerance, pace, checkpoint, dtype, columns, graph
+        )
 
-        quotes['signal_line'] = estimate_signal.ewm(span=self.signal_periods).mean()
-        quotes['relative_signal'] = quotes['macd'] - quotes['signal_line']
+    def _new_filter(self, num_parameters: int, asset: str) -> AdaptiveFilter:
+        return SignLMSFilter(num_parameters, asset_pace(self.pace, asset), history=None, dtype=self.dtype)
 
-        return quotes
 
-
-class RLS_MACD(MACD):
+class RLS_MACD(AdaptiveMACD):
     def __init__(
         self,
         quotes: pd.DataFrame,
@@ -137,35 +469,20 @@ class RLS_MACD(MACD):
         signal_periods: int,
         lamb: float,
         sigma: float,
-        tolerance: float = 2e-1
+        tolerance: float = 2e-1,
+        method: str = 'standard',
+        checkpoint: Optional[Dict] = None,
+        dtype: Union[str, type, None] = None,
+        columns: Optional[Iterable[str]] = None,
+        graph: Optional[IndicatorGraph] = None
     ) -> None:
         self.lamb = lamb
         self.sigma = sigma
+        self.method = method
 
-        super().__init__(quotes, short_periods, long_periods, signal_periods, tolerance)
-
-    def _construct_indicator(self, quotes: pd.DataFrame) -> pd.Series:
-        entry = quotes['close'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['close'].values
-
-        estimate_short, _ = rls(entry, reference, self.short_periods, self.lamb, self.sigma)
-        estimate_long, _ = rls(entry, reference, self.long_periods, self.lamb, self.sigma)
-        estimate_short = pd.Series(estimate_short)
-        estimate_long = pd.Series(estimate_long)
-
-        quotes['short_ma'] = estimate_short.ewm(span=self.short_periods).mean()
-        quotes['long_ma'] = estimate_long.ewm(span=self.long_periods).mean()
-        quotes['macd'] = quotes['short_ma'] - quotes['long_ma']
-
-        entry = quotes['macd'].shift().values
-        entry[0] = quotes['open'].values[0]
-        reference = quotes['macd'].values
-
-        estimate_signal, _ = rls(entry, reference, self.signal_periods, self.lamb, self.sigma)
-        estimate_signal = pd.Series(estimate_signal)
-
-        quotes['signal_line'] = estimate_signal.ewm(span=self.signal_periods).mean()
-        quotes['relative_signal'] = quotes['macd'] - quotes['signal_line']
+        super().__init__(
+            quotes, short_periods, long_periods, signal_periods, tolerance, checkpoint, dtype, columns, graph
+        )
 
-        return quotes
+    def _new_filter(self, num_parameters: int, asset: str) -> AdaptiveFilter:
+        return RLSFilter(num_parameters, self.lamb, self.sigma, self.method, history=None, dtype=self.dtype)
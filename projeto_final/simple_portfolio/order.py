@@ -6,7 +6,6 @@ import pandas as pd
 
 # from asset import Asset
 from .transaction import Transaction
-from .utils import generate_id
 
 TYPES = (
     'LONG',
@@ -65,10 +64,57 @@ class Order:
 
 
 class OrderStore(dict):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    """
+    Open orders by id, with the executed and cancelled ones moved to `self.archive`.
+
+    Ids are consecutive integers, in the order the orders are placed. Open orders are also indexed by asset, and
+    storing an order that is no longer open (e.g. `store[order_id] = updated_order`) moves it to the archive,
+    which is append-only, so placing an order and evaluating the open ones cost O(1) and O(open orders), however
+    many orders were placed before. Archived orders can still be looked up by id.
+    """
+    def __init__(self, orders: Optional[Dict[int, Order]] = None) -> None:
+        super().__init__()
+        self.archive = {}
+        self._open_by_asset = {}
+        self._next_id = 0
+
+        for order_id, order in ({} if orders is None else orders).items():
+            self[order_id] = order
+
+    def __setitem__(self, order_id: int, order: Order) -> None:
+        assert isinstance(order_id, (int, np.integer)), f"Order ids should be integers. Got {order_id}."
+
+        self._next_id = max(self._next_id, order_id + 1)
+        if order_id in self:
+            del self[order_id]
+
+        if order.status == 'OPEN':
+            super().__setitem__(order_id, order)
+            self._open_by_asset.setdefault(order.asset, {})[order_id] = order
+        else:
+            self.archive[order_id] = order
+
+    def __delitem__(self, order_id: int) -> None:
+        asset = self[order_id].asset
+        super().__delitem__(order_id)
+
+        del self._open_by_asset[asset][order_id]
+        if len(self._open_by_asset[asset]) == 0:
+            del self._open_by_asset[asset]
+
+    def __missing__(self, order_id: int) -> Order:
+        return self.archive[order_id]
 
-    def evaluate_open_orders(self, ticks: pd.DataFrame) -> List[Transaction]:
+    @property
+    def next_id(self) -> int:
+        """Id of the next order placed."""
+        return self._next_id
+
+    def __reduce__(self) -> Tuple:
+        # Archived orders first, so that copies keep the order of the archive.
+        return self.__class__, ({**self.archive, **self},)
+
+    def evaluate_open_orders(self, ticks: pd.DataFrame) -> List[Tuple[int, Transaction]]:
         """
         Evaluate the execution of the existing open orders after the closing of a tick.
 
@@ -79,19 +125,17 @@ class OrderStore(dict):
         ticks: pd.DataFrame, Tick data for each asset traded, including "high", "low" and "quantity".
 
         """
-        open_orders = self.get_open_orders()
-        assets = np.unique([order.asset for order in open_orders.values()])
         timestamp = ticks.index[0][0]
         transactions_performed = []
 
-        for asset in assets:
+        for asset in sorted(self._open_by_asset):
             asset_tick = ticks.xs(asset, level='asset')
             high = asset_tick['high'].values[0]
             low = asset_tick['low'].values[0]
             quantity = asset_tick['quantity'].values[0]
 
-            asset_orders = {order_id: order for order_id, order in open_orders.items() if order.asset == asset}
-            for order_id, order in asset_orders.items():
+            asset_orders = list(self._open_by_asset[asset].items())
+            for order_id, order in asset_orders:
                 updated_order, transaction = order.evaluate_execution(high, low, quantity, timestamp)
                 self[order_id] = updated_order
 
@@ -101,20 +145,17 @@ class OrderStore(dict):
 
         return transactions_performed
 
-    def get_open_orders(self) -> Dict[str, Order]:
-        open_orders = {order_id: order for order_id, order in self.items() if order.status == 'OPEN'}
-        return open_orders
-
-    def place_order(self, asset: 'str', price: float, quantity: int, order_type: str) -> str:
-        existing_ids = list(self.keys())
+    def get_open_orders(self) -> Dict[int, Order]:
+        return dict(self)
 
-        order_id = generate_id(existing_ids)
+    def place_order(self, asset: 'str', price: float, quantity: int, order_type: str) -> int:
+        order_id = self._next_id
         order = Order(asset, price, quantity, order_type)
         self[order_id] = order
 
         return order_id
 
-    def rollback(self, order_id: str) -> str:
+    def rollback(self, order_id: int) -> int:
         order = self[order_id]
         # TODO If there is aging, status must go OPEN -> age -> CANCELLED
         order.status = 'CANCELLED'
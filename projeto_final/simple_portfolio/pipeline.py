@@ -0,0 +1,112 @@
+import weakref
+from collections import Counter
+from itertools import count
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+
+def _num_bytes(value: Any) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_num_bytes(item) for item in value)
+
+    return 0
+
+
+class IndicatorGraph:
+    """
+    Lazily evaluated graph of the values computed by indicators, e.g. TP -> rolling std -> bands -> signal.
+
+    Nodes are added under hashable keys, along with the keys of the nodes they are computed from. Adding a key
+    that is already in the graph keeps the existing node, so indicators built on the same graph share the nodes
+    they have in common, e.g. the typical prices and rolling statistics of a sweep over the `deviations` of
+    `BollingerBands` on the same quotes. Keys refer to objects (e.g. the quotes) by their `token`.
+
+    Nothing is computed until `evaluate`, which computes each node its targets depend on once, after its inputs,
+    and drops every value as soon as the last node depending on it is computed, so that only the values still
+    needed are held at any time.
+    """
+    def __init__(self) -> None:
+        self._nodes = {}
+        self._requested = []
+        self._tokens = {}
+        self._counter = count()
+        # Nodes computed over all evaluations, and the most bytes of arrays held by the graph at once.
+        self.num_computed = 0
+        self.peak_bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def token(self, owner: Any) -> int:
+        """
+        Number identifying `owner` in the keys of nodes, assigned the first time it is asked for. Unlike `id`, it
+        is never given to another object once `owner` is garbage collected.
+        """
+        key = id(owner)
+        if key not in self._tokens or self._tokens[key][0]() is not owner:
+            self._tokens[key] = (weakref.ref(owner, lambda _: self._tokens.pop(key, None)), next(self._counter))
+
+        return self._tokens[key][1]
+
+    def add(self, key: Hashable, compute: Callable[..., Any], inputs: Tuple[Hashable, ...] = ()) -> Hashable:
+        """Add a node computing `compute(*values of inputs)`, unless `key` is already in the graph. Returns `key`."""
+        for input_key in inputs:
+            assert input_key in self._nodes, f"Input {input_key} of node {key} is not in the graph."
+
+        self._nodes.setdefault(key, (compute, tuple(inputs)))
+        return key
+
+    def request(self, key: Hashable) -> None:
+        """Have the next `evaluate` compute `key`, e.g. a node that hands an indicator its results."""
+        assert key in self._nodes, f"Node {key} is not in the graph."
+
+        self._requested.append(key)
+
+    def _order(self, targets: List[Hashable]) -> List[Hashable]:
+        """The targets and the nodes they depend on, each after its inputs."""
+        order, visited = [], set()
+
+        def visit(key: Hashable) -> None:
+            if key not in visited:
+                visited.add(key)
+                for input_key in self._nodes[key][1]:
+                    visit(input_key)
+                order.append(key)
+
+        for key in targets:
+            visit(key)
+
+        return order
+
+    def evaluate(self, targets: Iterable[Hashable] = ()) -> Dict[Hashable, Any]:
+        """
+        Compute the requested nodes and `targets`, returning the values of `targets`.
+
+        The computed nodes leave the graph, so that it holds no reference to their inputs (e.g. indicators)
+        anymore. Adding them again computes them again.
+        """
+        targets = list(targets)
+        order = self._order(self._requested + targets)
+        self._requested = []
+        consumers = Counter(input_key for key in order for input_key in self._nodes[key][1])
+        kept = set(targets)
+
+        values = {}
+        for key in order:
+            compute, inputs = self._nodes.pop(key)
+            values[key] = compute(*(values[input_key] for input_key in inputs))
+            self.num_computed += 1
+            self.peak_bytes = max(self.peak_bytes, sum(_num_bytes(value) for value in values.values()))
+
+            consumers.subtract(inputs)
+            for done in set(inputs) | {key}:
+                if consumers[done] == 0 and done not in kept:
+                    del values[done]
+
+        return {key: values[key] for key in targets}
@@ -1,16 +1,23 @@
 """Implementation of a simple portfolio."""
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import pandas as pd
 
+from .backtest import ArrayBacktest
 from .order import Order, OrderStore
-from .transaction import TransactionStore
+from .transaction import Transaction, TransactionStore
 from .position import PositionStore
 
 
 LOG_FORMAT = "%(levelname)s %(asctime)s - %(name)s: %(message)s"
 
+# Engines of `Portfolio.backtest`.
+ENGINES = (
+    'arrays',
+    'pandas',
+)
+
 
 class Portfolio:
     def __init__(
@@ -45,21 +52,15 @@ class Portfolio:
         transactions_performed = self.orders.evaluate_open_orders(ticks)
 
         for order_id, transaction in transactions_performed:
-            position, profit, opened_contracts = self.positions.update_position(transaction)
-
-            # TODO Replace 125 with asset.initial_margin when asset class is implemented
-            margin_required = opened_contracts * 125
+            _, profit, opened_contracts = self.positions.update_position(transaction)
+            margin_required = self._margin_required(opened_contracts)
 
             if self.available_capital - margin_required < 0:
+                self.positions.rollback(transaction.asset)
                 self.orders.rollback(order_id)
                 continue
 
-            trx_id, trx = self.transaction_history.register_transaction(transaction)
-            self.logger.debug("Transaction {} Registered: {} {} {} contracts at {:.2f}.".format(
-                trx_id, trx.type, trx.quantity, trx.asset, trx.price
-            ))
-
-            self.positions[trx.asset] = position
+            self._register_transaction(transaction)
 
             self.allocated_capital += margin_required
             self.available_capital += profit - margin_required
@@ -89,16 +90,25 @@ class Portfolio:
 
         return orders_to_issue
 
+    @staticmethod
+    def _margin_required(opened_contracts: int) -> int:
+        # TODO Replace 125 with asset.initial_margin when asset class is implemented
+        return opened_contracts * 125
+
+    def _register_transaction(self, transaction: Transaction) -> Transaction:
+        trx_id, trx = self.transaction_history.register_transaction(transaction)
+        self.logger.debug("Transaction {} Registered: {} {} {} contracts at {:.2f}.".format(
+            trx_id, trx.type, trx.quantity, trx.asset, trx.price
+        ))
+
+        return trx
+
     def _get_order_size(self, asset: str, direction: str) -> int:
         # TODO Implement logic to decide order size based on current positions.
-        position_summary = self.positions.summary()
-
-        overall_position = sum([pos['quantity'] for pos in position_summary.values()])
+        overall_position = self.positions.overall_quantity
         max_overall_order = self.max_overall_exposition - overall_position
 
-        asset_position = 0
-        if asset in position_summary.keys() and position_summary[asset]['direction'] == direction:
-            asset_position = position_summary[asset]['quantity']
+        asset_position = self.positions.quantity(asset, direction)
 
         max_asset_position = self.max_single_exposition - asset_position
 
@@ -109,7 +119,19 @@ class Portfolio:
         price = tick['low'].values[0] if direction == 'SHORT' else tick['high'].values[0]
         return price
 
-    def backtest(self, ticks: pd.DataFrame, signals: pd.DataFrame) -> float:
+    def backtest(self, ticks: pd.DataFrame, signals: pd.DataFrame, engine: str = 'arrays') -> float:
+        """
+        Trade `signals` over `ticks`, one period (datetime) at a time, returning the final available capital.
+
+        The 'arrays' engine (see `backtest.ArrayBacktest`) runs the periods over numpy arrays extracted once
+        from `ticks` and `signals`, while the 'pandas' one slices them at every period. Both leave the portfolio
+        in the same state.
+        """
+        assert engine in ENGINES, f"Invalid engine {engine}. Should be one of {ENGINES}."
+
+        if engine == 'arrays':
+            return ArrayBacktest(self, ticks, signals).run()
+
         tick_times = ticks.index.get_level_values('datetime').unique()
         closed = False
         for i, time in enumerate(tick_times):
@@ -141,16 +163,21 @@ class Portfolio:
         return message
 
     def _update_margins(self, closing: bool) -> None:
+        self._adjust_margins(self._margin_adjustment(self.positions.summary(), closing))
+
+    @staticmethod
+    def _margin_adjustment(summary: Dict, closing: bool) -> int:
+        """Margin allocated at the closing (or released at the opening) for the positions in `summary`."""
         margin_delta = {
             'DOLFUT': 15000 - 125,
             'INDFUT': 10000 - 125,
         }
 
         mult = 1 if closing else -1
-        summary = self.positions.summary()
 
-        margin_adjustment = mult * sum([margin_delta[asset] * pos['quantity'] for asset, pos in summary.items()])
+        return mult * sum([margin_delta[asset] * pos['quantity'] for asset, pos in summary.items()])
 
+    def _adjust_margins(self, margin_adjustment: int) -> None:
         self.allocated_capital += margin_adjustment
         self.available_capital -= margin_adjustment
 
@@ -1,17 +1,26 @@
+import heapq
 from collections import defaultdict
-from copy import deepcopy
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 from .transaction import Transaction
 
 
 class Position:
-    # By keeping short entries sorted in crescent order and long entries sorted in decrescent order,
-    # we can pop the last entry of each to evaluate updating a position, and append if necessary.
-    # This will be the short entry with the highest price or the long entry with the lowest price.
-    _entry_sort_order = {
-        'SHORT': False,
-        'LONG': True
+    """
+    Book of the entries of a position in an asset, updated in place.
+
+    The entries of each direction are kept in a heap whose first entry is the one to be liquidated first: the
+    short entry with the highest price or the long entry with the lowest price (the most recent one among entries
+    at the same price). Liquidating or opening an entry costs O(log entries), and the quantity and total entry
+    price of each direction are kept up to date along the heaps, so `summary` costs O(1).
+    """
+    # Heap entries are [key, -sequence, entry price, quantity] lists, where the key sorts short entries by
+    # decrescent and long entries by crescent price.
+    _entry_key_mult = {
+        'SHORT': -1,
+        'LONG': 1
     }
 
     def __init__(
@@ -21,10 +30,17 @@ class Position:
     ) -> None:
         self.asset = asset
 
-        self.entries = {
-            'SHORT': [],
-            'LONG': []
-        } if entries is None else entries
+        self._heaps = {'SHORT': [], 'LONG': []}
+        self._quantity = {'SHORT': 0, 'LONG': 0}
+        self._cost = {'SHORT': 0, 'LONG': 0}
+        self._num_entries = 0
+        self._undo = None
+
+        # Entries of each direction sorted as `self.entries`, so the latter of entries at the same price goes first.
+        entries = {} if entries is None else entries
+        for direction, direction_entries in entries.items():
+            for entry in direction_entries:
+                self._push_entry(direction, entry['entry_price'], entry['quantity'])
 
     @staticmethod
     def _make_entry(entry_price, quantity):
@@ -35,46 +51,72 @@ class Position:
 
         return entry
 
-    def update(self, transaction: Transaction) -> Tuple['Position', float, int]:
-        current_entries, profit, closed_quantity = self._liquidate_opposite_entries(transaction)
+    @property
+    def entries(self) -> Dict:
+        """Entries of each direction, short ones in crescent and long ones in decrescent order of price."""
+        return {
+            direction: [self._make_entry(price, quantity) for _, _, price, quantity in sorted(heap, reverse=True)]
+            for direction, heap in self._heaps.items()
+        }
 
-        if transaction.quantity <= closed_quantity:
-            updated_entries = current_entries
-            open_quantity = 0
-        else:
-            transaction.quantity = transaction.quantity - closed_quantity
-            updated_entries = self._register_entry(transaction, current_entries)
-            open_quantity = transaction.quantity
+    @property
+    def direction(self) -> str:
+        return 'LONG' if len(self._heaps['LONG']) != 0 else 'SHORT'
 
-        opened_contracts = open_quantity - closed_quantity
+    @property
+    def quantity(self) -> int:
+        return self._quantity[self.direction]
 
-        return Position(self.asset, updated_entries), profit, opened_contracts
+    @property
+    def average_price(self) -> float:
+        """Entry price of the outstanding contracts, weighted by their quantity (NaN if there are none)."""
+        direction = self.direction
+        quantity = self._quantity[direction]
 
-    def _register_entry(self, transaction: Transaction, entries: Dict) -> Dict:
-        direction = transaction.type
-        new_entry = self._make_entry(transaction.price, transaction.quantity)
+        return self._cost[direction] / quantity if quantity != 0 else np.nan
 
-        current_entries = entries
-        entry_list = current_entries[direction]
-        entry_list.append(new_entry)
+    def _push_entry(self, direction: str, entry_price: float, quantity: int) -> List:
+        entry = [self._entry_key_mult[direction] * entry_price, -self._num_entries, entry_price, quantity]
+        heapq.heappush(self._heaps[direction], entry)
 
-        entry_list = sorted(
-            entry_list,
-            key=lambda pos: pos['entry_price'],
-            reverse=self._entry_sort_order[direction]
-        )
+        self._num_entries += 1
+        self._quantity[direction] += quantity
+        self._cost[direction] += entry_price * quantity
+
+        return entry
+
+    def update(self, transaction: Transaction) -> Tuple['Position', float, int]:
+        """
+        Liquidate opposite entries with `transaction`, then open an entry with the contracts left, if any.
+
+        Returns the position itself, the profit realized and the contracts opened (negative when closing).
+        `transaction` is left as traded, and `rollback` undoes the update.
+        """
+        state = (dict(self._quantity), dict(self._cost), self._num_entries)
+        profit, closed_quantity, liquidated_entries, partial_entry = self._liquidate_opposite_entries(transaction)
+
+        if transaction.quantity <= closed_quantity:
+            new_entry = None
+            open_quantity = 0
+        else:
+            open_quantity = transaction.quantity - closed_quantity
+            new_entry = self._push_entry(transaction.type, transaction.price, open_quantity)
 
-        current_entries[direction] = entry_list
-        return current_entries
+        opened_contracts = open_quantity - closed_quantity
+        self._undo = (transaction.type, state, liquidated_entries, partial_entry, new_entry)
 
-    def _liquidate_opposite_entries(self, transaction: Transaction) -> Tuple[Dict, float, int]:
-        current_entries = deepcopy(self.entries)
+        return self, profit, opened_contracts
 
+    def _liquidate_opposite_entries(self, transaction: Transaction) -> Tuple[float, int, List, Optional[Tuple]]:
+        """
+        Returns the profit and quantity liquidated, the entries popped, and the entry partially liquidated, if
+        any, with its previous quantity.
+        """
         other_direction = 'SHORT' if transaction.type == 'LONG' else 'LONG'
-        opposite_entries = current_entries[other_direction]
+        opposite_entries = self._heaps[other_direction]
 
         if len(opposite_entries) == 0:
-            return current_entries, 0, 0
+            return 0, 0, [], None
 
         # profit := (short_price - long_price) * traded_quantity
         profit_mult = -1 if other_direction == 'LONG' else 1
@@ -82,36 +124,56 @@ class Position:
         quantity = transaction.quantity
         total_liquidated_quantity = 0
         total_profit = 0
+        liquidated_cost = 0
+        liquidated_entries = []
+        partial_entry = None
 
         while quantity > 0 and len(opposite_entries) > 0:
-            entry = opposite_entries.pop()
-            opposite_quantity = entry['quantity']
+            entry = opposite_entries[0]
+            _, _, entry_price, opposite_quantity = entry
 
             liquidated_quantity = min(opposite_quantity, quantity)
-            total_profit += profit_mult * (entry['entry_price'] - transaction.price) * liquidated_quantity
+            total_profit += profit_mult * (entry_price - transaction.price) * liquidated_quantity
+            liquidated_cost += entry_price * liquidated_quantity
 
             if liquidated_quantity < opposite_quantity:
-                opposite_quantity = opposite_quantity - liquidated_quantity
-                entry['quantity'] = opposite_quantity
-                opposite_entries.append(entry)
+                partial_entry = (entry, opposite_quantity)
+                entry[3] = opposite_quantity - liquidated_quantity
+            else:
+                liquidated_entries.append(heapq.heappop(opposite_entries))
 
             total_liquidated_quantity += liquidated_quantity
             quantity -= liquidated_quantity
 
-        current_entries[other_direction] = opposite_entries
+        self._quantity[other_direction] -= total_liquidated_quantity
+        # Starts over from 0 once all entries are liquidated, so that rounding errors don't pile up.
+        self._cost[other_direction] = self._cost[other_direction] - liquidated_cost if opposite_entries else 0
 
-        return current_entries, total_profit, total_liquidated_quantity
+        return total_profit, total_liquidated_quantity, liquidated_entries, partial_entry
 
-    def summary(self) -> Dict:
-        entries = self.entries
-        if len(entries['LONG']) != 0:
-            direction = 'LONG'
-        else:
-            direction = 'SHORT'
+    def rollback(self) -> None:
+        """Undo the last `update`, e.g. when the portfolio can't afford it."""
+        assert self._undo is not None, f"No update of position in {self.asset} to roll back."
 
-        net_quantity = sum((entry['quantity'] for entry in entries[direction]))
+        direction, state, liquidated_entries, partial_entry, new_entry = self._undo
+        self._quantity, self._cost, self._num_entries = state
+        self._undo = None
 
-        return {'direction': direction, 'quantity': net_quantity}
+        if new_entry is not None:
+            heap = self._heaps[direction]
+            heap.remove(new_entry)
+            heapq.heapify(heap)
+
+        if partial_entry is not None:
+            entry, quantity = partial_entry
+            entry[3] = quantity
+
+        other_direction = 'SHORT' if direction == 'LONG' else 'LONG'
+        for entry in liquidated_entries:
+            heapq.heappush(self._heaps[other_direction], entry)
+
+    def summary(self) -> Dict:
+        return {'direction': self.direction, 'quantity': self.quantity}
 
     def __repr__(self) -> str:
         summ = self.summary()
@@ -125,6 +187,12 @@ class Position:
 
 
 class PositionStore(defaultdict):
+    """
+    Positions by asset, with the summary of each position and the overall quantity of contracts held kept up to
+    date as positions are stored, updated and rolled back, so order sizing and margining look them up in O(1).
+
+    Positions must be updated through the store (`update_position` and `rollback`) for it to keep track of them.
+    """
     def __init__(self, positions: Optional[Dict] = None) -> None:
         positions = {} if positions is None else positions
 
@@ -133,20 +201,55 @@ class PositionStore(defaultdict):
         assert all((isinstance(pos, Position) for pos in values)),\
             f"All positions should be instances of 'Position'. Got {values}."
 
-        super().__init__(Position, positions)
+        super().__init__(Position)
+        self._summaries = {}
+        self.overall_quantity = 0
+
+        for asset, position in positions.items():
+            self[asset] = position
+
+    def __setitem__(self, asset: str, position: Position) -> None:
+        super().__setitem__(asset, position)
+        self._refresh(asset)
+
+    def __delitem__(self, asset: str) -> None:
+        super().__delitem__(asset)
+        self.overall_quantity -= self._summaries.pop(asset)['quantity']
 
     def __missing__(self, key: str) -> Position:
         self[key] = new = self.default_factory(key)
         return new
 
+    def __reduce__(self) -> Tuple:
+        return self.__class__, (dict(self),)
+
+    def _refresh(self, asset: str) -> None:
+        summary = self[asset].summary()
+        previous = self._summaries.get(asset)
+
+        self.overall_quantity += summary['quantity'] - (0 if previous is None else previous['quantity'])
+        self._summaries[asset] = summary
+
     def update_position(self, transaction: Transaction) -> Tuple[Position, float, int]:
         asset_position = self[transaction.asset]
         updated_position, profit_realized, opened_contracts = asset_position.update(transaction)
+        self._refresh(transaction.asset)
 
         return updated_position, profit_realized, opened_contracts
 
+    def rollback(self, asset: str) -> None:
+        """Undo the last update of the position in `asset`."""
+        self[asset].rollback()
+        self._refresh(asset)
+
+    def quantity(self, asset: str, direction: str) -> int:
+        """Contracts held in `asset` in `direction`."""
+        summary = self._summaries.get(asset)
+
+        return summary['quantity'] if summary is not None and summary['direction'] == direction else 0
+
     def summary(self) -> Dict:
-        summary = {asset: position.summary() for asset, position in self.items()}
+        summary = {asset: dict(asset_summary) for asset, asset_summary in self._summaries.items()}
         return summary
 
     def __repr__(self) -> str:
@@ -0,0 +1,146 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+from simple_portfolio.feature_cache import fingerprint
+
+
+class AssetSegments:
+    """
+    Rows of quotes indexed by (datetime, asset), grouped into one contiguous segment per asset.
+
+    The quotes interleave the bars of all their assets. `gather` reorders a column so that the bars of
+    `assets[a]` are `offsets[a]:offsets[a + 1]`, still in time order, which lets the indicators compute every
+    asset in a single vectorized pass over the segments, and `scatter` takes the results back to the rows of the
+    quotes. With a single asset both are no-ops.
+    """
+    def __init__(self, index: pd.MultiIndex) -> None:
+        codes, assets = pd.factorize(index.get_level_values('asset'), sort=True)
+
+        self.assets = np.asarray(assets)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=self.assets.shape[0]))])
+        # Stable, so the bars of each asset keep their order.
+        self._order = np.argsort(codes, kind='stable') if self.assets.shape[0] > 1 else None
+
+    @property
+    def num_segments(self) -> int:
+        return self.assets.shape[0]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self.offsets[:-1]
+
+    @property
+    def ends(self) -> np.ndarray:
+        """Position of the last bar of each segment."""
+        return self.offsets[1:] - 1
+
+    def positions(self) -> np.ndarray:
+        """Position of every gathered row inside its segment."""
+        return np.arange(self.offsets[-1]) - np.repeat(self.starts, self.lengths)
+
+    def gather(self, values: np.ndarray) -> np.ndarray:
+        return values if self._order is None else values[self._order]
+
+    def scatter(self, values: np.ndarray) -> np.ndarray:
+        if self._order is None:
+            return values
+
+        scattered = np.empty_like(values)
+        scattered[self._order] = values
+        return scattered
+
+    def with_lookback(self, values: np.ndarray, lookbacks: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gathered `values` with `lookbacks[a]` (e.g. the values before a checkpoint) prepended to segment `a`.
+
+        Returns the extended values and the offsets of their segments, see `without_lookback`.
+        """
+        lookback_lengths = np.array([lookback.shape[0] for lookback in lookbacks], dtype=int)
+        extended = np.insert(
+            values,
+            np.repeat(self.starts, lookback_lengths),
+            np.concatenate([np.zeros(0, dtype=values.dtype)] + list(lookbacks)).astype(values.dtype, copy=False)
+        )
+
+        return extended, self.offsets + np.concatenate([[0], np.cumsum(lookback_lengths)])
+
+    def without_lookback(self, extended: np.ndarray, extended_offsets: np.ndarray) -> np.ndarray:
+        """Gathered rows of `extended`, a column computed over the output of `with_lookback`."""
+        return extended[np.repeat(extended_offsets[1:] - self.lengths, self.lengths) + self.positions()]
+
+
+class _SegmentWindows(BaseIndexer):
+    """Windows of `window_size` values that never reach before the start of their segment (`offsets`)."""
+    def get_window_bounds(
+        self,
+        num_values: int = 0,
+        min_periods: Optional[int] = None,
+        center: Optional[bool] = None,
+        closed: Optional[str] = None,
+        step: Optional[int] = None
+    ):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        segment_starts = np.repeat(self.offsets[:-1], np.diff(self.offsets))
+
+        return np.maximum(end - self.window_size, segment_starts).astype(np.int64), end
+
+
+def segment_rolling(values: np.ndarray, offsets: np.ndarray, window: int, statistic: str) -> np.ndarray:
+    """
+    `pd.Series(segment).rolling(window)` `statistic` of every segment of `values`, in a single pass.
+
+    Windows are cut at the start of their segment, and so have fewer than `window` values (giving NaN) for the
+    first bars of each segment. With a single segment this is the plain rolling statistic, bit for bit.
+    """
+    if offsets.shape[0] <= 2:
+        return getattr(pd.Series(values).rolling(window), statistic)().values
+
+    windows = _SegmentWindows(window_size=window, offsets=offsets)
+    return getattr(pd.Series(values).rolling(windows, min_periods=window), statistic)().values
+
+
+def segment_ewm_mean(values: np.ndarray, offsets: np.ndarray, span: int) -> np.ndarray:
+    """`pd.Series(segment).ewm(span=span).mean()` of every segment of `values`, in a single pass."""
+    if offsets.shape[0] <= 2:
+        return pd.Series(values).ewm(span=span).mean().values
+
+    segment_ids = np.repeat(np.arange(offsets.shape[0] - 1), np.diff(offsets))
+    return pd.Series(values).groupby(segment_ids).ewm(span=span).mean().values
+
+
+def asset_paces(quotes: pd.DataFrame) -> Dict[str, float]:
+    """
+    Default LMS pace of the adaptive indicators for each asset of `quotes`: the variance of its typical price over
+    its energy, so that the pace of an asset only depends on its own bars. With a single asset this is the pace
+    over all of `quotes`, bit for bit.
+    """
+    segments = AssetSegments(quotes.index)
+    signal = segments.gather(quotes.eval("(high + low + close) / 3").values)
+
+    return {
+        asset: segment.var() / np.correlate(segment, segment, 'valid')[0]
+        for asset, segment in zip(segments.assets, np.split(signal, segments.offsets[1:-1]))
+    }
+
+
+def asset_pace(pace: Union[float, Dict[str, float], None], asset: str) -> Optional[float]:
+    """
+    Pace of the filters of `asset`, given the `pace` of an adaptive indicator: either the same for all assets, or
+    one per asset (see `asset_paces`), whose median goes to the assets first seen in `update`.
+    """
+    if not isinstance(pace, dict):
+        return pace
+
+    return pace[asset] if asset in pace else float(np.median(list(pace.values())))
+
+
+def segments_fingerprint(values: np.ndarray, offsets: np.ndarray) -> str:
+    """Feature cache fingerprint of `values` cut into segments at `offsets`."""
+    return fingerprint(values) + fingerprint(offsets)
@@ -0,0 +1,297 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from simple_portfolio.bollinger import LMSBands
+from simple_portfolio.macd import LMS_MACD
+from simple_portfolio.pipeline import IndicatorGraph
+from simple_portfolio.portfolio import Portfolio
+from simple_portfolio.segments import asset_paces
+
+# Columns of the results of `sweep`, after the parameters.
+RESULT_COLUMNS = (
+    'available_capital',
+    'allocated_capital',
+    'total_capital',
+    'num_transactions',
+)
+
+# Quotes of a worker process of `sweep`, and the shared memory block holding their arrays.
+_shared_quotes = None
+
+
+def _parameter_grid(grid: Union[Dict[str, Sequence], Sequence[Dict]]) -> List[Dict]:
+    """Parameters of each point of `grid`: every combination of the values of a dict, or the dicts of a list."""
+    if isinstance(grid, dict):
+        return [dict(zip(grid, values)) for values in product(*grid.values())]
+
+    return [dict(params) for params in grid]
+
+
+def _period_rows(quotes: pd.DataFrame, period: slice) -> slice:
+    """
+    Rows of `quotes` in `period`, a slice of positions (as `iloc`) or of datetimes, whose stop is included (as
+    `loc`).
+    """
+    assert period.step is None, f"Periods should be contiguous. Got step {period.step}."
+
+    bounds = (period.start, period.stop)
+    if all(bound is None or isinstance(bound, (int, np.integer)) for bound in bounds):
+        return period
+
+    times = quotes.index.get_level_values('datetime')
+    start = 0 if period.start is None else times.searchsorted(pd.Timestamp(period.start))
+    stop = len(times) if period.stop is None else times.searchsorted(pd.Timestamp(period.stop), side='right')
+
+    return slice(int(start), int(stop))
+
+
+def _share_quotes(quotes: pd.DataFrame) -> Tuple[SharedMemory, Dict]:
+    """
+    Copy the columns of `quotes` and the levels and codes of their index into a shared memory block.
+
+    Returns the block and its layout, which `_attach_quotes` rebuilds the quotes from. Arrays of objects (e.g.
+    the names of the assets) don't fit in shared memory and are kept in the layout itself.
+    """
+    index = quotes.index
+    arrays = (
+        [quotes[column].values for column in quotes.columns] +
+        [level.values for level in index.levels] + [np.asarray(codes) for codes in index.codes]
+    )
+
+    offsets, num_bytes = [], 0
+    for values in arrays:
+        offsets.append(num_bytes)
+        if values.dtype != object:
+            # Aligned to 64 bytes, as numpy allocates arrays.
+            num_bytes += -(-values.nbytes // 64) * 64
+
+    block = SharedMemory(create=True, size=max(num_bytes, 1))
+    entries = []
+    for values, offset in zip(arrays, offsets):
+        if values.dtype == object:
+            entries.append(values)
+            continue
+
+        shared = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf, offset=offset)
+        shared[:] = values
+        entries.append((values.dtype.str, values.shape, offset))
+
+    layout = {
+        'name': block.name,
+        'columns': list(quotes.columns),
+        'names': list(index.names),
+        'arrays': entries,
+    }
+
+    return block, layout
+
+
+def _attach_quotes(layout: Dict) -> None:
+    """Rebuild the quotes of `_share_quotes`, as read-only views of the shared memory block."""
+    global _shared_quotes
+
+    block = SharedMemory(name=layout['name'])
+    arrays = []
+    for entry in layout['arrays']:
+        if isinstance(entry, np.ndarray):
+            arrays.append(entry)
+            continue
+
+        dtype, shape, offset = entry
+        values = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        values.flags.writeable = False
+        arrays.append(values)
+
+    num_columns, num_levels = len(layout['columns']), len(layout['names'])
+    levels = arrays[num_columns:num_columns + num_levels]
+    codes = arrays[num_columns + num_levels:]
+    index = pd.MultiIndex(levels=levels, codes=codes, names=layout['names'], verify_integrity=False)
+    quotes = pd.DataFrame(dict(zip(layout['columns'], arrays[:num_columns])), index=index, copy=False)
+
+    _shared_quotes = (block, quotes)
+
+
+def _build_indicators(indicator_class: type, quotes: pd.DataFrame, points: List[Dict]) -> List:
+    """Indicators of each parameters of `points`, keeping only their signals, built on the same graph."""
+    graph = IndicatorGraph()
+
+    return [indicator_class(quotes, **params, columns=(), graph=graph) for params in points]
+
+
+def _backtest(indicator, rows: slice, portfolio_options: Dict, engine: str) -> Dict:
+    """Results (see `RESULT_COLUMNS`) of a new portfolio trading the signals of `indicator` over `rows`."""
+    portfolio = Portfolio(**portfolio_options)
+    available_capital = portfolio.backtest(indicator.quotes.iloc[rows], indicator.signals.iloc[rows], engine=engine)
+
+    return {
+        'available_capital': available_capital,
+        'allocated_capital': portfolio.allocated_capital,
+        'total_capital': available_capital + portfolio.allocated_capital,
+        'num_transactions': len(portfolio.transaction_history),
+    }
+
+
+def _run_chunk(
+    quotes: Optional[pd.DataFrame],
+    chunk: List[Dict],
+    indicator_class: type,
+    portfolio_options: Dict,
+    rows: slice,
+    engine: str
+) -> List[Dict]:
+    """
+    Backtest the signals of `indicator_class` over `quotes` (the shared ones if None) with each parameters of
+    `chunk`, built on the same graph so they share what they compute in common.
+    """
+    quotes = _shared_quotes[1] if quotes is None else quotes
+
+    return [
+        {**params, **_backtest(indicator, rows, portfolio_options, engine)}
+        for params, indicator in zip(chunk, _build_indicators(indicator_class, quotes, chunk))
+    ]
+
+
+def sweep(
+    indicator_class: type,
+    quotes: pd.DataFrame,
+    grid: Union[Dict[str, Sequence], Sequence[Dict]],
+    portfolio_options: Dict,
+    period: slice = slice(None),
+    num_workers: int = 1,
+    chunk_size: Optional[int] = None,
+    engine: str = 'arrays'
+) -> pd.DataFrame:
+    """
+    Backtest the signals of `indicator_class` over `quotes` for every parameters of `grid`.
+
+    `grid` maps the arguments of the indicator to the values to try, every combination of which is tried, or
+    lists the arguments of each point, e.g. `[{'num_periods': n, 'long_periods': 3 * n, ...} for n in ...]`.
+    Each point builds the indicator over all of `quotes` and backtests a new `Portfolio(**portfolio_options)`
+    over the rows of `period` only, either positions (e.g. `slice(None, 20000)`) or datetimes. Defaults computed
+    from the quotes (e.g. the LMS pace) see all of `quotes`, unless `grid` sets them.
+
+    Points are run in chunks of `chunk_size`, whose indicators share the values they compute in common (see
+    `IndicatorGraph`). With `num_workers > 1` the chunks are spread over that many processes, which read the
+    columns of `quotes` from shared memory, copied there once, instead of each receiving a copy.
+
+    Returns the parameters and results (see `RESULT_COLUMNS`) of each point, ranked by decreasing total capital.
+    """
+    assert num_workers > 0, f"Number of workers should be positive. Got {num_workers}."
+
+    points = _parameter_grid(grid)
+    rows = _period_rows(quotes, period)
+    if chunk_size is None:
+        chunk_size = max(-(-len(points) // (4 * num_workers)), 1)
+    chunks = [points[start:start + chunk_size] for start in range(0, len(points), chunk_size)]
+
+    run_chunk = partial(
+        _run_chunk, indicator_class=indicator_class, portfolio_options=portfolio_options, rows=rows, engine=engine
+    )
+    if num_workers > 1:
+        block, layout = _share_quotes(quotes)
+        try:
+            with ProcessPoolExecutor(num_workers, initializer=_attach_quotes, initargs=(layout,)) as executor:
+                chunk_results = list(executor.map(partial(run_chunk, None), chunks))
+        finally:
+            block.close()
+            block.unlink()
+    else:
+        chunk_results = [run_chunk(quotes, chunk) for chunk in chunks]
+
+    results = pd.DataFrame(
+        [result for chunk in chunk_results for result in chunk],
+        columns=list(dict.fromkeys(key for point in points for key in point)) + list(RESULT_COLUMNS)
+    )
+
+    return results.sort_values('total_capital', ascending=False, kind='stable', ignore_index=True)
+
+
+def _data_defaults(indicator_class: type, quotes: pd.DataFrame) -> Dict:
+    """Arguments of `indicator_class` whose defaults are computed from its quotes, computed from `quotes` instead."""
+    if issubclass(indicator_class, (LMSBands, LMS_MACD)):
+        return {'pace': asset_paces(quotes)}
+
+    return {}
+
+
+def _period_offsets(quotes: pd.DataFrame) -> np.ndarray:
+    """Row where each period (datetime) of `quotes` starts, and the number of rows."""
+    times = quotes.index.get_level_values('datetime').values
+
+    return np.append(np.flatnonzero(np.concatenate([[True], times[1:] != times[:-1]])), times.shape[0])
+
+
+def walk_forward(
+    indicator_class: type,
+    quotes: pd.DataFrame,
+    grid: Union[Dict[str, Sequence], Sequence[Dict]],
+    portfolio_options: Dict,
+    in_sample: int,
+    out_of_sample: int,
+    step: Optional[int] = None,
+    anchored: bool = False,
+    engine: str = 'arrays'
+) -> pd.DataFrame:
+    """
+    Walk-forward optimization of the parameters of `indicator_class` over `quotes`.
+
+    Windows of `in_sample` periods (datetimes), followed by `out_of_sample` periods, move forward by `step`
+    periods (by default, `out_of_sample`) until the end of `quotes`. With `anchored`, in-sample windows start at
+    the first period instead, and grow. In each window, the parameters of `grid` (see `sweep`) with the highest
+    total capital in-sample are backtested out-of-sample, each backtest with a new `Portfolio(**portfolio_options)`.
+
+    The indicator of each parameters is built once over all of `quotes`, so its filters carry their state from a
+    window to the next instead of restarting, and the windows only slice its signals: N windows cost a single
+    computation of the indicators, and N backtests of each parameters in-sample. The indicators are causal, but
+    some defaults are computed over all the quotes an indicator is built on (e.g. the LMS pace), which would let
+    in-sample choices see out-of-sample bars. Unless `grid` sets them, they are computed over the first in-sample
+    window only, and kept for all windows.
+
+    Returns, for each window, its first in-sample, first out-of-sample and last out-of-sample datetimes, the
+    parameters chosen, their in-sample total capital and their out-of-sample results (see `RESULT_COLUMNS`).
+    """
+    step = out_of_sample if step is None else step
+    assert in_sample > 0 and out_of_sample > 0 and step > 0, \
+        f"Windows should have positive lengths. Got {in_sample}, {out_of_sample} and {step}."
+
+    points = _parameter_grid(grid)
+    offsets = _period_offsets(quotes)
+    times = quotes.index.get_level_values('datetime')
+    num_periods = offsets.shape[0] - 1
+
+    defaults = _data_defaults(indicator_class, quotes.iloc[:int(offsets[min(in_sample, num_periods)])])
+    indicators = _build_indicators(indicator_class, quotes, [{**defaults, **params} for params in points])
+
+    windows = []
+    for start in range(0, num_periods - in_sample - out_of_sample + 1, step):
+        in_sample_start = 0 if anchored else start
+        split, end = start + in_sample, start + in_sample + out_of_sample
+        in_sample_rows = slice(int(offsets[in_sample_start]), int(offsets[split]))
+        out_of_sample_rows = slice(int(offsets[split]), int(offsets[end]))
+
+        in_sample_capital = [
+            _backtest(indicator, in_sample_rows, portfolio_options, engine)['total_capital']
+            for indicator in indicators
+        ]
+        best = int(np.argmax(in_sample_capital))
+        windows.append({
+            'in_sample_start': times[in_sample_rows.start],
+            'out_of_sample_start': times[out_of_sample_rows.start],
+            'out_of_sample_end': times[out_of_sample_rows.stop - 1],
+            **points[best],
+            'in_sample_capital': in_sample_capital[best],
+            **_backtest(indicators[best], out_of_sample_rows, portfolio_options, engine),
+        })
+
+    columns = (
+        ['in_sample_start', 'out_of_sample_start', 'out_of_sample_end'] +
+        list(dict.fromkeys(key for point in points for key in point)) + ['in_sample_capital'] + list(RESULT_COLUMNS)
+    )
+
+    return pd.DataFrame(windows, columns=columns)
@@ -1,9 +1,17 @@
+import os
 from datetime import datetime
-from typing import Dict, Optional, Union, Tuple
+from typing import Dict, Iterable, Iterator, Optional, Union, Tuple
 
+import numpy as np
 import pandas as pd
 
-from .utils import generate_id
+# Sign of each transaction type, as stored in the 'side' column of a `TransactionStore`.
+SIDES = {
+    'LONG': 1,
+    'SHORT': -1,
+    'ZERO': 0,
+}
+TYPES = {side: type for type, side in SIDES.items()}
 
 
 class Transaction:
@@ -20,7 +28,7 @@ class Transaction:
         self.quantity = quantity
         self.type = type
 
-        timestamp = timestamp if isinstance(timestamp, datetime) else pd._tslib.parse_datetime_string(timestamp)
+        timestamp = timestamp if isinstance(timestamp, datetime) else pd.Timestamp(timestamp)
         self.timestamp = timestamp
 
     def __repr__(self) -> str:
@@ -31,13 +39,178 @@ class Transaction:
         return message
 
 
-class TransactionStore(dict):
-    def __init__(self, transactions: Optional[Dict[str, Transaction]] = None):
-        transactions = {} if transactions is None else transactions
-        super().__init__(transactions)
+class TransactionStore:
+    """
+    Append-only log of transactions, kept as columns of numpy arrays: 'timestamp', 'asset' (a code into
+    `self.assets`), 'side' (see `SIDES`), 'price' and 'quantity'.
 
-    def register_transaction(self, transaction: Transaction) -> Tuple[str, Transaction]:
-        transaction_id = generate_id(self.keys())
-        self[transaction_id] = transaction
+    Ids are the consecutive integer positions of the transactions in the log. The arrays are preallocated and
+    doubled when full, so appending costs O(1) (amortized) and no Python object is kept per transaction:
+    `Transaction` objects are only built when one is looked up. Queries such as `turnover` and `pnl` run over
+    whole columns, and `to_frame`, `to_npy` and `to_parquet` export them without going through Python objects.
+    """
+    def __init__(
+        self,
+        transactions: Union[Dict[int, Transaction], Iterable[Transaction], None] = None,
+        capacity: int = 1024
+    ) -> None:
+        assert capacity > 0, f"Capacity should be positive. Got {capacity}."
+
+        self.assets = []
+        self._asset_codes = {}
+        self._size = 0
+        self._columns = {
+            'timestamp': np.empty(capacity, dtype='datetime64[ns]'),
+            'asset': np.empty(capacity, dtype=np.int32),
+            'side': np.empty(capacity, dtype=np.int8),
+            'price': np.empty(capacity, dtype=np.float64),
+            'quantity': np.empty(capacity, dtype=np.int64),
+        }
+
+        transactions = () if transactions is None else transactions
+        for transaction in transactions.values() if isinstance(transactions, dict) else transactions:
+            self.register_transaction(transaction)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, transaction_id: int) -> Transaction:
+        if not 0 <= transaction_id < self._size:
+            raise KeyError(transaction_id)
+
+        columns = {name: values[transaction_id] for name, values in self._columns.items()}
+
+        return Transaction(
+            self.assets[columns['asset']], float(columns['price']), int(columns['quantity']), TYPES[columns['side']],
+            pd.Timestamp(columns['timestamp'])
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._size))
+
+    def keys(self) -> range:
+        return range(self._size)
+
+    def values(self) -> Iterator[Transaction]:
+        return (self[transaction_id] for transaction_id in range(self._size))
+
+    def items(self) -> Iterator[Tuple[int, Transaction]]:
+        return ((transaction_id, self[transaction_id]) for transaction_id in range(self._size))
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Views of the columns of the transactions logged so far."""
+        return {name: values[:self._size] for name, values in self._columns.items()}
+
+    def _asset_code(self, asset: str) -> int:
+        if asset not in self._asset_codes:
+            self._asset_codes[asset] = len(self.assets)
+            self.assets.append(asset)
+
+        return self._asset_codes[asset]
+
+    def append(
+        self,
+        asset: str,
+        price: float,
+        quantity: int,
+        type: str,
+        timestamp: Union[str, datetime, np.datetime64]
+    ) -> int:
+        """Log a transaction from its fields, returning its id."""
+        capacity = self._columns['price'].shape[0]
+        if self._size == capacity:
+            for name, values in self._columns.items():
+                self._columns[name] = np.concatenate([values, np.empty(capacity, dtype=values.dtype)])
+
+        transaction_id = self._size
+        columns = self._columns
+        columns['timestamp'][transaction_id] = pd.Timestamp(timestamp).to_datetime64()
+        columns['asset'][transaction_id] = self._asset_code(asset)
+        columns['side'][transaction_id] = SIDES[type]
+        columns['price'][transaction_id] = price
+        columns['quantity'][transaction_id] = quantity
+        self._size += 1
+
+        return transaction_id
+
+    def register_transaction(self, transaction: Transaction) -> Tuple[int, Transaction]:
+        transaction_id = self.append(
+            transaction.asset, transaction.price, transaction.quantity, transaction.type, transaction.timestamp
+        )
 
         return transaction_id, transaction
+
+    def _by_asset(self, values: np.ndarray) -> pd.Series:
+        sums = np.bincount(self.columns['asset'], weights=values, minlength=len(self.assets))
+
+        return pd.Series(sums, index=pd.Index(self.assets, name='asset'))
+
+    def notional(self) -> np.ndarray:
+        """Traded value (price times quantity) of each transaction."""
+        columns = self.columns
+
+        return columns['price'] * columns['quantity']
+
+    def cash_flows(self) -> np.ndarray:
+        """Cash received by each transaction: positive when selling (SHORT), negative when buying (LONG)."""
+        return -self.columns['side'] * self.notional()
+
+    def net_quantity(self) -> pd.Series:
+        """Contracts held by asset after all transactions, positive when long."""
+        columns = self.columns
+
+        return self._by_asset(columns['side'] * columns['quantity']).astype(np.int64)
+
+    def turnover(self) -> pd.Series:
+        """Total traded value by asset."""
+        return self._by_asset(self.notional())
+
+    def pnl(self, prices: Optional[Dict[str, float]] = None) -> pd.Series:
+        """
+        Profit by asset, with the contracts still held valued at `prices` (by default, each asset's last traded
+        price), so that it is the realized profit of the assets without open contracts.
+        """
+        columns = self.columns
+        last_traded = np.zeros(len(self.assets))
+        last_traded[columns['asset']] = columns['price']
+        marks = last_traded if prices is None else np.array([prices[asset] for asset in self.assets])
+
+        return self._by_asset(self.cash_flows()) + self.net_quantity() * marks
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame of the transactions, indexed by id. Its numeric columns are views of the log, not copies, and
+        'asset' is categorical.
+        """
+        columns = self.columns
+        columns['asset'] = pd.Categorical.from_codes(columns['asset'], categories=self.assets)
+
+        return pd.DataFrame(columns, index=pd.RangeIndex(self._size, name='id'), copy=False)
+
+    def to_npy(self, directory: str) -> None:
+        """Save each column to `directory`/<column>.npy, and the asset names to `directory`/assets.npy."""
+        os.makedirs(directory, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(os.path.join(directory, name + '.npy'), values)
+        np.save(os.path.join(directory, 'assets.npy'), np.array(self.assets, dtype=str))
+
+    @classmethod
+    def from_npy(cls, directory: str) -> 'TransactionStore':
+        """Load a log saved by `to_npy`."""
+        columns = {
+            name: np.load(os.path.join(directory, name + '.npy'))
+            for name in ('timestamp', 'asset', 'side', 'price', 'quantity')
+        }
+        store = cls(capacity=max(columns['price'].shape[0], 1))
+        store.assets = [str(asset) for asset in np.load(os.path.join(directory, 'assets.npy'))]
+        store._asset_codes = {asset: code for code, asset in enumerate(store.assets)}
+        store._size = columns['price'].shape[0]
+        for name, values in columns.items():
+            store._columns[name][:store._size] = values
+
+        return store
+
+    def to_parquet(self, path: str) -> None:
+        """Save the transactions to a Parquet file (needs pyarrow or fastparquet)."""
+        self.to_frame().to_parquet(path)
@@ -1,11 +1,18 @@
-from typing import List
-from uuid import uuid4
+from typing import Dict, Union
 
+import numpy as np
 import pandas as pd
 
+# Separates the keys of nested dicts in checkpoint files.
+CHECKPOINT_SEPARATOR = '/'
 
-def process_profitchart_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Process data from BR Profit Chart format to OHLC format."""
+
+def process_profitchart_data(df: pd.DataFrame, dtype: Union[str, type] = np.float64) -> pd.DataFrame:
+    """
+    Process data from BR Profit Chart format to OHLC format.
+
+    Prices and volumes are stored as `dtype`, e.g. `np.float32` to halve the memory of long histories.
+    """
     _df = df.copy()
 
     _df['datetime'] = _df['Data'] + ' ' + _df['Hora']
@@ -24,18 +31,58 @@ def process_profitchart_data(df: pd.DataFrame) -> pd.DataFrame:
         'Quantidade': 'quantity'
     })
 
-    _df = _df.applymap(lambda value: value.replace('.', '').replace(',', '.')).astype(float)
-    _df['quantity'] = _df['quantity'].astype(int)
+    _df = _df.applymap(lambda value: value.replace('.', '').replace(',', '.'))
+    # Parsed in double precision first, so that large quantities are exact even when `dtype` is `np.float32`.
+    _df['quantity'] = _df['quantity'].astype(float).astype(int)
+    _df = _df.astype({column: dtype for column in _df.columns if column != 'quantity'})
     _df = _df.sort_index()
 
     return _df
 
 
-def generate_id(existing_ids: List[str]) -> str:
-    collision = True
+def bar_datetime(bar: pd.Series) -> np.datetime64:
+    """Datetime of a row of quotes (e.g. from `quotes.iloc[i]` or `quotes.iterrows()`), indexed by (datetime, asset)."""
+    label = bar.name[0] if isinstance(bar.name, tuple) else bar.name
+
+    return pd.Timestamp(label).to_datetime64()
+
+
+def bar_asset(bar: pd.Series) -> str:
+    """Asset of a row of quotes indexed by (datetime, asset)."""
+    assert isinstance(bar.name, tuple), "Bars should be rows of quotes indexed by (datetime, asset)."
+
+    return bar.name[1]
+
+
+def save_checkpoint(checkpoint: Dict, path: str) -> None:
+    """
+    Save a (possibly nested) dict of numbers, strings and arrays, such as the output of an adaptive filter's
+    `get_state` or an indicator's `get_checkpoint`, to a `.npz` file.
+    """
+    def flatten(values: Dict, prefix: str) -> Dict:
+        flat = {}
+        for key, value in values.items():
+            if isinstance(value, dict):
+                flat.update(flatten(value, prefix + key + CHECKPOINT_SEPARATOR))
+            else:
+                flat[prefix + key] = np.asarray(value)
+
+        return flat
+
+    np.savez(path, **flatten(checkpoint, ''))
+
+
+def load_checkpoint(path: str) -> Dict:
+    """Load a dict saved by `save_checkpoint`."""
+    checkpoint = {}
+    with np.load(path) as data:
+        for key in data.files:
+            *parents, name = key.split(CHECKPOINT_SEPARATOR)
+            values = checkpoint
+            for parent in parents:
+                values = values.setdefault(parent, {})
 
-    while collision:
-        new_id = uuid4().hex
-        collision = new_id in existing_ids
+            value = data[key]
+            values[name] = value[()] if value.ndim == 0 else value
 
-    return new_id
+    return checkpoint
@@ -0,0 +1,44 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def random_walk(num_samples: int, level: float = 1e5, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Random-walk prices around `level`, and the previous price of each (the entry of the price filters)."""
+    rng = np.random.default_rng(seed)
+    prices = level + np.cumsum(20 * rng.standard_normal(num_samples))
+
+    return np.concatenate([prices[:1], prices[:-1]]), prices
+
+
+def random_quotes(
+    num_periods: int,
+    assets: Sequence[str] = ('DOLFUT', 'INDFUT'),
+    step: float = 1.0,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Minute bars of random-walk prices of each of `assets`, with steps of standard deviation `step`, interleaved as
+    the quotes of the indicators.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2020-01-02 09:00', periods=num_periods, freq='min')
+    frames = []
+    for asset_number, asset in enumerate(assets):
+        close = 1000 * (asset_number + 1) + np.cumsum(step * rng.standard_normal(num_periods))
+        open_price = close + 0.3 * rng.standard_normal(num_periods)
+        quantity = rng.integers(1, 500, size=num_periods)
+        frames.append(pd.DataFrame(
+            {
+                'open': open_price,
+                'high': np.maximum(open_price, close) + np.abs(rng.standard_normal(num_periods)),
+                'low': np.minimum(open_price, close) - np.abs(rng.standard_normal(num_periods)),
+                'close': close,
+                'volume': quantity * close,
+                'quantity': quantity,
+            },
+            index=pd.MultiIndex.from_arrays([times, [asset] * num_periods], names=['datetime', 'asset'])
+        ))
+
+    return pd.concat(frames).sort_index()
@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.linalg import solve, toeplitz
+
+from simple_portfolio.adaptive_filters import (
+    LMSFilter, RLSFilter, SignLMSFilter, WienerSolver, error_signal_lms, frequency_domain_lms, lms, process_orders,
+    rls
+)
+from simple_portfolio.bollinger import RLSBands
+from simple_portfolio.learning_curves import identification_data, learning_curves
+from simple_portfolio.macd import RLS_MACD
+from tests.synthetic import random_quotes, random_walk
+
+
+SYSTEM = np.array([1, 0.5, -0.3, 0.2, -0.1, 0.05, 0.02, -0.01])
+
+
+def test_frequency_domain_lms_with_unit_blocks_is_lms():
+    signals, references = identification_data(SYSTEM, 1, 3000, seed=0)
+
+    estimate, weights = lms(signals[0], references[0], SYSTEM.shape[0], 0.01)
+    block_estimate, block_weights = frequency_domain_lms(signals[0], references[0], SYSTEM.shape[0], 0.01, block_size=1)
+
+    np.testing.assert_allclose(block_estimate, estimate, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(block_weights, weights, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('block_size', [4, 8])
+def test_frequency_domain_lms_learning_curve_matches_lms(block_size):
+    num_realizations, num_samples, pace = 50, 3000, 0.005
+    signals, references = identification_data(SYSTEM, num_realizations, num_samples, seed=0)
+
+    mse = learning_curves('lms', SYSTEM, num_realizations, num_samples, seed=0, pace=pace)['mse']
+    block_mse = np.mean([
+        np.square(reference - frequency_domain_lms(signal, reference, SYSTEM.shape[0], pace, block_size, None)[0])
+        for signal, reference in zip(signals, references)
+    ], axis=0)
+
+    def smooth(curve):
+        return np.convolve(curve, np.ones(100) / 100, 'valid')
+
+    # Same transient, up to the delay of the block updates, and the same steady state.
+    np.testing.assert_allclose(smooth(block_mse), smooth(mse), rtol=0.05)
+    np.testing.assert_allclose(block_mse[-500:].mean(), mse[-500:].mean(), rtol=0.01)
+
+
+def test_wiener_solver_matches_normal_equations():
+    signals, references = identification_data(SYSTEM, 1, 2000, seed=0)
+    signal, reference = signals[0], references[0]
+    max_parameters = 12
+    solver = WienerSolver(signal, reference, max_parameters)
+
+    lags = slice(signal.shape[0] - 1, signal.shape[0] - 1 + max_parameters)
+    autocorrelation = np.correlate(signal, signal, 'full')[lags]
+    cross_correlation = np.correlate(reference, signal, 'full')[lags]
+    np.testing.assert_allclose(solver.autocorrelation, autocorrelation, rtol=1e-10)
+    np.testing.assert_allclose(solver.cross_correlation, cross_correlation, rtol=1e-10, atol=1e-9)
+
+    # The Levinson-Durbin recursion solves every order on the way to the highest.
+    for num_parameters in range(1, max_parameters + 1):
+        weights = solve(toeplitz(autocorrelation[:num_parameters]), cross_correlation[:num_parameters])
+        np.testing.assert_allclose(solver.weights(num_parameters), weights, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(
+            solver.estimate(num_parameters), np.convolve(signal, weights)[:signal.shape[0]], rtol=0, atol=1e-10
+        )
+
+
+@pytest.mark.parametrize('num_parameters', [5, 21, 44])
+def test_lattice_rls_is_stable_on_prices(num_parameters):
+    entry, prices = random_walk(50000)
+
+    estimate, _ = rls(entry, prices, num_parameters, 0.99, 10, method='lattice', history=None)
+    reference, _ = rls(entry, prices, num_parameters, 0.99, 10, method='inverse_qr', history=None)
+
+    # Both solve the same least squares problem, so past the first samples they agree up to rounding.
+    np.testing.assert_allclose(estimate[1000:], reference[1000:], rtol=1e-9)
+
+
+def test_lattice_rls_weights_match_estimates():
+    signals, references = identification_data(SYSTEM, 1, 3000, seed=0)
+
+    estimate, weights = rls(signals[0], references[0], SYSTEM.shape[0], 0.99, 1e-3, method='lattice')
+    _, qr_weights = rls(signals[0], references[0], SYSTEM.shape[0], 0.99, 1e-3, method='inverse_qr')
+    taps = np.lib.stride_tricks.sliding_window_view(
+        np.concatenate([np.zeros(SYSTEM.shape[0] - 1), signals[0]]), SYSTEM.shape[0]
+    )[:, ::-1]
+
+    np.testing.assert_allclose(np.einsum('nm,nm->n', weights, taps), estimate, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(weights[100:], qr_weights[100:], rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize('method', ['lattice', 'inverse_qr'])
+def test_rls_chunks_match_whole_signal(method):
+    entry, prices = random_walk(5000)
+
+    whole, whole_weights = RLSFilter(10, 0.99, 10, method=method).process(entry, prices)
+    chunked_filter = RLSFilter(10, 0.99, 10, method=method)
+    chunks = [
+        chunked_filter.process(entry[start:start + 777], prices[start:start + 777])
+        for start in range(0, 5000, 777)
+    ]
+
+    np.testing.assert_array_equal(np.concatenate([estimate for estimate, _ in chunks]), whole)
+    np.testing.assert_array_equal(np.concatenate([weights for _, weights in chunks]), whole_weights)
+
+
+@pytest.mark.parametrize('indicator', [RLSBands, RLS_MACD])
+def test_price_indicators_with_lattice_rls_match_inverse_qr(indicator):
+    quotes = random_quotes(3000)
+    periods = (21, 2) if indicator is RLSBands else (21, 44, 9)
+
+    lattice = indicator(quotes, *periods, 0.99, 10, method='lattice').result.to_frame()
+    inverse_qr = indicator(quotes, *periods, 0.99, 10, method='inverse_qr').result.to_frame()
+
+    pd.testing.assert_frame_equal(lattice.iloc[1000:], inverse_qr.iloc[1000:], rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize('new_filter', [
+    lambda: LMSFilter(SYSTEM.shape[0], 0.01),
+    lambda: SignLMSFilter(SYSTEM.shape[0], 0.001),
+    lambda: RLSFilter(SYSTEM.shape[0], 0.99, 1e-3),
+])
+@pytest.mark.parametrize('chunk_size', [1, 7, 33, 1000])
+def test_chunks_match_whole_signal(new_filter, chunk_size):
+    signals, references = identification_data(SYSTEM, 1, 3000, seed=0)
+
+    whole, whole_history = new_filter().process(signals[0], references[0])
+    chunks = list(new_filter().process_chunks(signals[0], references[0], chunk_size))
+
+    np.testing.assert_array_equal(np.concatenate([estimate for estimate, _ in chunks]), whole)
+    np.testing.assert_array_equal(np.concatenate([history for _, history in chunks]), whole_history)
+
+
+@pytest.mark.parametrize('new_filter', [
+    lambda order: LMSFilter(order, 1e-12, history=None),
+    lambda order: RLSFilter(order, 0.99, 10, history=None),
+])
+@pytest.mark.parametrize('offsets', [[0, 3000], [0, 700, 1900, 3000]])
+def test_process_orders_matches_independent_filters(new_filter, offsets):
+    entry, prices = random_walk(3000)
+    offsets = np.array(offsets)
+    orders = (12, 26, 9)
+
+    fused_filters = [[new_filter(order) for order in orders] for _ in offsets[1:]]
+    filters = [[new_filter(order) for order in orders] for _ in offsets[1:]]
+    for chunk in (slice(0, 1500), slice(1500, 3000)):
+        # Chunks cut the segments, so the second call starts from the samples carried by each filter.
+        chunk_offsets = np.clip(offsets, chunk.start, chunk.stop) - chunk.start
+        fused = process_orders(fused_filters, entry[chunk], prices[chunk], chunk_offsets)
+
+        for k, segment_filters in enumerate(filters):
+            segment = slice(chunk.start + chunk_offsets[k], chunk.start + chunk_offsets[k + 1])
+            for o, adaptive_filter in enumerate(segment_filters):
+                estimate, _ = adaptive_filter.process(entry[segment], prices[segment])
+                np.testing.assert_array_equal(fused[o, chunk_offsets[k]:chunk_offsets[k + 1]], estimate)
+
+    for fused_segment, segment_filters in zip(fused_filters, filters):
+        for fused_filter, adaptive_filter in zip(fused_segment, segment_filters):
+            np.testing.assert_array_equal(fused_filter.weights, adaptive_filter.weights)
+
+
+@pytest.mark.parametrize('new_filter', [
+    lambda history, every: LMSFilter(SYSTEM.shape[0], 0.01, history, every),
+    lambda history, every: RLSFilter(SYSTEM.shape[0], 0.99, 1e-3, history=history, every=every),
+])
+@pytest.mark.parametrize('sink', [None, 'memory', 'array', 'memmap'])
+@pytest.mark.parametrize('every', [1, 3])
+def test_history_sinks_match_history_in_memory(new_filter, sink, every, tmp_path):
+    signals, references = identification_data(SYSTEM, 1, 3000, seed=0)
+    estimate, expected = new_filter('memory', 1).process(signals[0], references[0])
+    expected = expected[::every]
+
+    history = {
+        'array': np.zeros(expected.shape), 'memmap': str(tmp_path / 'history.dat')
+    }.get(sink, sink)
+    adaptive_filter = new_filter(history, every)
+    # Chunks that are not multiples of `every`, so that the recorded samples fall anywhere in a chunk.
+    chunks = list(adaptive_filter.process_chunks(signals[0], references[0], 700))
+
+    np.testing.assert_array_equal(np.concatenate([chunk_estimate for chunk_estimate, _ in chunks]), estimate)
+    if sink is None:
+        assert all(chunk_history is None for _, chunk_history in chunks)
+        return
+    np.testing.assert_array_equal(np.concatenate([chunk_history for _, chunk_history in chunks]), expected)
+    if sink == 'array':
+        np.testing.assert_array_equal(history, expected)
+    if sink == 'memmap':
+        np.testing.assert_array_equal(np.memmap(history, dtype=np.float64, mode='r', shape=expected.shape), expected)
+
+
+@pytest.mark.parametrize('run, channel_params, shared_param', [
+    (lambda signal, reference, pace: lms(signal, reference, SYSTEM.shape[0], pace), [0.01, 1e-4, 1.0], None),
+    (
+        lambda signal, reference, pace: error_signal_lms(signal, reference, SYSTEM.shape[0], pace),
+        [0.001, 1e-4, 0.01], None
+    ),
+] + [
+    (
+        lambda signal, reference, fading, method=method: rls(
+            signal, reference, SYSTEM.shape[0], fading, 1e-3, method=method
+        ),
+        [0.99, 0.98, 0.995], 0.99
+    )
+    for method in ('standard', 'lattice', 'inverse_qr')
+], ids=['lms', 'error_signal_lms', 'rls', 'lattice_rls', 'inverse_qr_rls'])
+@pytest.mark.parametrize('per_channel', [True, False])
+def test_multichannel_matches_single_channels(run, channel_params, shared_param, per_channel):
+    signals, references = identification_data(SYSTEM, 3, 2000, seed=0)
+    # Every channel at a different scale, so that the default paces of the LMS filters differ.
+    scales = np.array([[1], [10], [0.1]])
+    signals, references = signals * scales, references * scales
+
+    estimates, histories = run(signals, references, channel_params if per_channel else shared_param)
+
+    for channel, param in enumerate(channel_params if per_channel else [shared_param] * 3):
+        estimate, history = run(signals[channel], references[channel], param)
+        np.testing.assert_array_equal(estimates[channel], estimate)
+        np.testing.assert_array_equal(histories[channel], history)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from simple_portfolio.adaptive_filters import AdaptiveFilter, LMSFilter, RLSFilter, SignLMSFilter
+from simple_portfolio.bollinger import LMSBands, RLSBands
+from simple_portfolio.macd import ES_MACD, RLS_MACD
+from simple_portfolio.utils import load_checkpoint, save_checkpoint
+from tests.synthetic import random_quotes, random_walk
+
+
+@pytest.mark.parametrize('new_filter', [
+    lambda history: LMSFilter(10, 1e-11, history=history),
+    lambda history: SignLMSFilter(10, 1e-3, history=history),
+    lambda history: RLSFilter(10, 0.99, 10, history=history),
+    lambda history: RLSFilter(10, 0.99, 10, 'lattice', history=history),
+    lambda history: RLSFilter(10, 0.99, 10, 'inverse_qr', history=history),
+])
+@pytest.mark.parametrize('history', [None, 'memory'])
+def test_filter_resumed_from_npz_matches_whole_signal(new_filter, history, tmp_path):
+    entry, prices = random_walk(3000)
+    whole, whole_history = new_filter(history).process(entry, prices)
+
+    converged = new_filter(history)
+    first, first_history = converged.process(entry[:1234], prices[:1234])
+    save_checkpoint(converged.get_state(), tmp_path / 'filter.npz')
+    resumed = AdaptiveFilter.from_state(load_checkpoint(tmp_path / 'filter.npz'), history=history)
+    rest, rest_history = resumed.process(entry[1234:], prices[1234:])
+
+    assert type(resumed) is type(converged) and resumed.num_samples == 3000
+    np.testing.assert_array_equal(np.concatenate([first, rest]), whole)
+    if history is not None:
+        np.testing.assert_array_equal(np.concatenate([first_history, rest_history]), whole_history)
+
+
+@pytest.mark.parametrize('indicator, arguments', [
+    (LMSBands, (20, 2, 60, 1e-9)),
+    (RLSBands, (20, 2, 0.99, 10)),
+    (ES_MACD, (12, 26, 9, 2e-1, 1e-9)),
+    (RLS_MACD, (12, 26, 9, 0.99, 10)),
+])
+def test_indicator_resumed_from_npz_matches_whole_quotes(indicator, arguments, tmp_path):
+    quotes = random_quotes(600, step=0.2)
+    times = quotes.index.get_level_values('datetime')
+    cut = times.unique()[300]
+    whole = indicator(quotes, *arguments)
+
+    save_checkpoint(indicator(quotes[times < cut], *arguments).get_checkpoint(), tmp_path / 'indicator.npz')
+    resumed = indicator(quotes, *arguments, checkpoint=load_checkpoint(tmp_path / 'indicator.npz'))
+
+    resumed_columns = resumed.result.to_frame()
+    assert (resumed_columns.index == quotes.index[times >= cut]).all()
+    # Up to rounding, as the resumed rolling statistics restart from the checkpointed bars.
+    np.testing.assert_allclose(
+        resumed_columns.values, whole.result.to_frame().loc[resumed_columns.index].values, rtol=1e-8, atol=1e-8
+    )
+    np.testing.assert_array_equal(resumed.signals['signal'].values, whole.signals.loc[resumed.signals.index, 'signal'])
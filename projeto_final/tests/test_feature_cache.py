@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from simple_portfolio.bollinger import BollingerBands
+from simple_portfolio.feature_cache import FEATURE_CACHE, FeatureCache, fingerprint
+from tests.synthetic import random_quotes
+
+
+def test_hit_returns_a_copy_without_computing():
+    cache = FeatureCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return np.arange(10.0)
+
+    first = cache.get(('key',), compute)
+    first[0] = -1
+    second = cache.get(('key',), compute)
+
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(second, np.arange(10.0))
+
+
+def test_least_recently_used_is_evicted_at_capacity():
+    cache = FeatureCache(max_bytes=3 * 800)
+    for key in 'abc':
+        cache.get((key,), lambda: np.zeros(100))
+    cache.get(('a',), lambda: np.zeros(100))
+
+    cache.get(('d',), lambda: np.zeros(100))
+
+    assert len(cache) == 3
+    assert cache.num_bytes == 3 * 800
+    hits = cache.hits
+    for key in 'acd':
+        cache.get((key,), lambda: np.ones(100))
+    assert cache.hits == hits + 3
+    # 'b' was evicted, so it is computed again.
+    np.testing.assert_array_equal(cache.get(('b',), lambda: np.ones(100)), np.ones(100))
+
+
+def test_changed_data_misses():
+    cache = FeatureCache()
+    values = np.arange(100.0)
+    key = fingerprint(values)
+    cache.get((key, 'sum'), lambda: np.cumsum(values))
+
+    values[50] = 0
+    changed = cache.get((fingerprint(values), 'sum'), lambda: np.cumsum(values))
+
+    assert fingerprint(values) != key
+    assert (cache.hits, cache.misses) == (0, 2)
+    np.testing.assert_array_equal(changed, np.cumsum(values))
+
+
+def test_indicators_share_cached_statistics_of_the_same_quotes():
+    quotes = random_quotes(1000)
+    changed = quotes.copy()
+    changed.iloc[500, changed.columns.get_loc('close')] += 10
+
+    FEATURE_CACHE.clear()
+    BollingerBands(quotes, 20, 2)
+    hits, misses = FEATURE_CACHE.hits, FEATURE_CACHE.misses
+    BollingerBands(quotes, 20, 3)
+    assert FEATURE_CACHE.hits > hits
+    assert FEATURE_CACHE.misses == misses
+
+    result = BollingerBands(changed, 20, 2).result.to_frame()
+    assert FEATURE_CACHE.misses > misses
+    FEATURE_CACHE.clear()
+    pd.testing.assert_frame_equal(result, BollingerBands(changed, 20, 2).result.to_frame())
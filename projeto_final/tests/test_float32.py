@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from simple_portfolio.adaptive_filters import lms, rls
+from simple_portfolio.bollinger import BollingerBands, LMSBands, RLSBands
+from simple_portfolio.macd import MACD, LMS_MACD, RLS_MACD
+from tests.synthetic import random_quotes, random_walk
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def relative_deviation(single: np.ndarray, double: np.ndarray) -> float:
+    """Largest deviation of `single` from `double`, relative to the largest magnitude of `double`."""
+    double = np.asarray(double, dtype=np.float64)
+
+    return np.nanmax(np.abs(np.asarray(single, dtype=np.float64) - double)) / np.nanmax(np.abs(double))
+
+
+@pytest.mark.parametrize('adaptive_filter, options', [
+    (lms, {'num_parameters': 10}),
+    (rls, {'num_parameters': 10, 'fading': 0.99, 'sigma': 10}),
+    (rls, {'num_parameters': 10, 'fading': 0.99, 'sigma': 10, 'method': 'inverse_qr'}),
+])
+def test_float32_filters_follow_float64(adaptive_filter, options):
+    entry, prices = random_walk(20000, level=5000, seed=1)
+
+    double, _ = adaptive_filter(entry, prices, **options, history=None, dtype=np.float64)
+    single, _ = adaptive_filter(entry, prices, **options, history=None, dtype=np.float32)
+
+    assert single.dtype == np.float32
+    assert relative_deviation(single, double) < 1e-5
+
+
+# Explicit paces for the LMS indicators, well within the stability bound of the synthetic prices.
+@pytest.mark.parametrize('indicator, arguments', [
+    (BollingerBands, (20, 2)),
+    (LMSBands, (20, 2, 60, 1e-9)),
+    (RLSBands, (20, 2, 0.99, 10)),
+    (MACD, (12, 26, 9)),
+    (LMS_MACD, (12, 26, 9, 0.2, 1e-9)),
+    (RLS_MACD, (12, 26, 9, 0.99, 10)),
+])
+def test_float32_indicators_follow_float64(indicator, arguments):
+    quotes = random_quotes(5000)
+
+    double = indicator(quotes, *arguments)
+    single = indicator(quotes.astype({column: np.float32 for column in PRICE_COLUMNS}), *arguments)
+
+    double_columns, single_columns = double.result.to_frame(), single.result.to_frame()
+    for column in double_columns.columns:
+        assert single_columns[column].dtype == np.float32
+        # The MACD lines are differences of close moving averages, which lose the most relative precision.
+        assert relative_deviation(single_columns[column].values, double_columns[column].values) < 1e-3, column
+
+    agreement = np.mean(single.signals['signal'].values == double.signals['signal'].values)
+    assert agreement > 0.99
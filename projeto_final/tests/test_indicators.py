@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from simple_portfolio.bollinger import ESBands, LMSBands
+from simple_portfolio.macd import ES_MACD, LMS_MACD
+from tests.synthetic import random_quotes
+
+
+@pytest.mark.parametrize('indicator, arguments', [
+    (LMSBands, (20, 2)),
+    (ESBands, (20, 2)),
+    (LMS_MACD, (12, 26, 9)),
+    (ES_MACD, (12, 26, 9)),
+])
+def test_default_pace_is_per_asset(indicator, arguments):
+    # Small steps, so the default pace of each asset is stable and the results are finite.
+    quotes = random_quotes(3000, step=0.2)
+
+    combined = indicator(quotes, *arguments)
+    combined_columns = combined.result.to_frame()
+    for asset in ('DOLFUT', 'INDFUT'):
+        asset_quotes = quotes.xs(asset, level='asset', drop_level=False)
+        alone = indicator(asset_quotes, *arguments)
+
+        assert combined.pace[asset] == alone.pace[asset]
+        alone_columns = alone.result.to_frame()
+        assert np.isfinite(alone_columns.values[100:]).all()
+        # Up to rounding, as the filters of all assets advance together.
+        np.testing.assert_allclose(
+            combined_columns.xs(asset, level='asset', drop_level=False).values, alone_columns.values, rtol=1e-9, atol=1e-9
+        )
+        np.testing.assert_array_equal(
+            combined.signals.xs(asset, level='asset')['signal'].values, alone.signals['signal'].values
+        )
@@ -0,0 +1,69 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from simple_portfolio.bollinger import BollingerBands, LMSBands
+from simple_portfolio.macd import MACD
+from simple_portfolio.pipeline import IndicatorGraph
+from tests.synthetic import random_quotes
+
+
+def test_tokens_are_not_reused_after_garbage_collection():
+    graph = IndicatorGraph()
+    quotes = random_quotes(10)
+
+    # Each frame is freed before the next one is made, so their ids are typically reused.
+    tokens = [graph.token(pd.DataFrame({'close': [float(k)]})) for k in range(100)]
+    gc.collect()
+
+    assert len(set(tokens)) == len(tokens)
+    assert graph.token(quotes) == graph.token(quotes)
+    assert graph.token(quotes) not in tokens
+
+
+def test_intermediates_are_freed():
+    graph = IndicatorGraph()
+    freed = {}
+
+    def step(key, previous):
+        values = previous + 1
+        freed[key] = weakref.ref(values)
+        return values
+
+    graph.add('start', lambda: np.zeros(1000))
+    for k in range(5):
+        graph.add(k, lambda previous, k=k: step(k, previous), ('start',) if k == 0 else (k - 1,))
+
+    values = graph.evaluate([4])
+
+    # Each step only needs the previous one, so at most two arrays are held at once.
+    assert graph.peak_bytes == 2 * 1000 * 8
+    assert len(graph) == 0
+    np.testing.assert_array_equal(values[4], np.full(1000, 5.0))
+    assert all(freed[k]() is None for k in range(4))
+    assert freed[4]() is values[4]
+
+
+@pytest.mark.parametrize('indicator, points', [
+    (BollingerBands, [dict(num_periods=20, deviations=deviations) for deviations in (1, 2, 3)]),
+    (LMSBands, [
+        dict(num_periods=num_periods, deviations=deviations) for num_periods, deviations in ((20, 2), (20, 3), (10, 2))
+    ]),
+    (MACD, [dict(short_periods=12, long_periods=26, signal_periods=signal) for signal in (5, 9)]),
+])
+def test_shared_graph_matches_eager_evaluation(indicator, points):
+    quotes = random_quotes(1000)
+    graph = IndicatorGraph()
+
+    shared = [indicator(quotes, **params, graph=graph) for params in points]
+    graph.evaluate()
+    eager = [indicator(quotes, **params) for params in points]
+
+    assert len(graph) == 0
+    assert graph.num_computed < sum(indicator.graph.num_computed for indicator in eager)
+    for lazy, expected in zip(shared, eager):
+        pd.testing.assert_frame_equal(lazy.result.to_frame(), expected.result.to_frame())
+        pd.testing.assert_frame_equal(lazy.signals, expected.signals)
@@ -0,0 +1,125 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from simple_portfolio.order import OrderStore
+from simple_portfolio.portfolio import Portfolio
+from simple_portfolio.position import Position, PositionStore
+from simple_portfolio.transaction import Transaction, TransactionStore
+from tests.synthetic import random_quotes
+
+
+def test_position_update_leaves_transaction_as_traded():
+    position = Position('DOLFUT')
+    history = TransactionStore()
+    for transaction in (
+        Transaction('DOLFUT', 5000.0, 100, 'LONG', '2020-01-02 09:00'),
+        Transaction('DOLFUT', 5010.0, 150, 'SHORT', '2020-01-02 09:01'),
+    ):
+        position.update(transaction)
+        history.register_transaction(transaction)
+
+    assert history[1].quantity == 150
+    assert position.summary() == {'direction': 'SHORT', 'quantity': 50}
+    assert history.net_quantity()['DOLFUT'] == -50
+
+
+def test_order_store_ids_and_archive_order():
+    store = OrderStore()
+    placed = [
+        store.place_order(asset, price, 10, 'LONG')
+        for asset, price in (('INDFUT', 100.0), ('DOLFUT', 50.0), ('INDFUT', 120.0), ('DOLFUT', 55.0))
+    ]
+    assert placed == [0, 1, 2, 3]
+    assert store.next_id == 4
+
+    store.rollback(2)
+    ticks = pd.DataFrame(
+        {'high': [52.0, 110.0], 'low': [48.0, 90.0], 'quantity': [4, 100]},
+        index=pd.MultiIndex.from_tuples(
+            [(pd.Timestamp('2020-01-02 09:00'), 'DOLFUT'), (pd.Timestamp('2020-01-02 09:00'), 'INDFUT')],
+            names=['datetime', 'asset']
+        )
+    )
+    transactions = store.evaluate_open_orders(ticks)
+
+    # Orders are archived as they leave the open ones: the rollback first, then by asset and id.
+    assert list(store.archive) == [2, 1, 3, 0]
+    assert [store[order_id].status for order_id in store.archive] == [
+        'CANCELLED', 'PARTIALLY_EXECUTED', 'CANCELLED', 'EXECUTED'
+    ]
+    assert [order_id for order_id, _ in transactions] == [1, 0]
+    assert len(store) == 0
+
+    # Ids are never reused, and copies keep the order of the archive.
+    assert store.place_order('DOLFUT', 51.0, 10, 'SHORT') == 4
+    assert list(store) == [4]
+    assert list(copy.deepcopy(store).archive) == [2, 1, 3, 0]
+
+
+@pytest.mark.parametrize('engine', ['arrays', 'pandas'])
+def test_transaction_history_matches_positions(engine):
+    quotes = random_quotes(1500)
+    rng = np.random.default_rng(1)
+    signals = pd.DataFrame({'signal': rng.choice([-1, 0, 0, 1], size=quotes.shape[0])}, index=quotes.index)
+    portfolio = Portfolio(
+        initial_capital=1e8, order_size=150, max_overall_exposition=10 ** 6, max_single_exposition=400
+    )
+
+    portfolio.backtest(quotes, signals, engine=engine)
+
+    history = portfolio.transaction_history
+    columns = history.columns
+    for code, asset in enumerate(history.assets):
+        held = np.cumsum((columns['side'] * columns['quantity'])[columns['asset'] == code])
+        # Some transactions go from long to short or back without stopping at zero.
+        assert (held[1:] * held[:-1] < 0).any()
+
+    net_quantity = history.net_quantity()
+    for asset, summary in portfolio.positions.summary().items():
+        sign = 1 if summary['direction'] == 'LONG' else -1
+        assert net_quantity[asset] == sign * summary['quantity']
+
+
+def _orders(store):
+    return [
+        (order_id, order.asset, order.price, order.quantity, order.order_type, order.status)
+        for order_id, order in store.items()
+    ]
+
+
+@pytest.mark.parametrize('initial_capital', [1e8, 6e4])
+def test_engines_leave_the_same_portfolio(initial_capital, monkeypatch):
+    quotes = random_quotes(1500)
+    rng = np.random.default_rng(2)
+    signals = pd.DataFrame({'signal': rng.choice([-1, 0, 0, 1], size=quotes.shape[0])}, index=quotes.index)
+
+    rollbacks = []
+    rollback = PositionStore.rollback
+
+    def counted_rollback(store, asset):
+        rollbacks.append(asset)
+        rollback(store, asset)
+
+    monkeypatch.setattr(PositionStore, 'rollback', counted_rollback)
+
+    portfolios = {}
+    for engine in ('arrays', 'pandas'):
+        portfolios[engine] = Portfolio(
+            initial_capital=initial_capital, order_size=150, max_overall_exposition=10 ** 6, max_single_exposition=400
+        )
+        portfolios[engine].backtest(quotes, signals, engine=engine)
+    arrays, pandas = portfolios['arrays'], portfolios['pandas']
+
+    # With little capital, orders are executed without the margin to hold them, and rolled back.
+    assert (len(rollbacks) > 0) == (initial_capital < 1e5)
+    assert arrays.available_capital == pandas.available_capital
+    assert arrays.allocated_capital == pandas.allocated_capital
+    assert arrays.positions.summary() == pandas.positions.summary()
+    assert arrays.transaction_history.assets == pandas.transaction_history.assets
+    for name, column in arrays.transaction_history.columns.items():
+        np.testing.assert_array_equal(column, pandas.transaction_history.columns[name])
+    assert _orders(arrays.orders) == _orders(pandas.orders)
+    assert _orders(arrays.orders.archive) == _orders(pandas.orders.archive)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from simple_portfolio.bollinger import BollingerBands, ESBands, LMSBands, RLSBands
+from simple_portfolio.macd import ES_MACD, LMS_MACD, MACD, RLS_MACD
+from tests.synthetic import random_quotes
+
+
+INDICATORS = [
+    (BollingerBands, (20, 2), {}),
+    (LMSBands, (20, 2), {'pace': None}),
+    (ESBands, (20, 2), {'pace': None}),
+    (RLSBands, (20, 2, 0.99, 10), {}),
+    (RLSBands, (20, 2, 0.99, 10), {'method': 'lattice'}),
+    (MACD, (12, 26, 9), {}),
+    (LMS_MACD, (12, 26, 9), {'pace': None}),
+    (ES_MACD, (12, 26, 9), {'pace': None}),
+    (RLS_MACD, (12, 26, 9, 0.99, 10), {}),
+    (RLS_MACD, (12, 26, 9, 0.99, 10), {'method': 'inverse_qr'}),
+]
+
+
+def assert_matches_batch(values, batch, bar_index):
+    """The output of `update` for the bar at `bar_index` equals the batch computation, up to rounding."""
+    columns = batch.result.to_frame().loc[bar_index]
+    for name, value in values.items():
+        if name == 'signal':
+            assert value == batch.signals.loc[bar_index, 'signal'], bar_index
+        else:
+            np.testing.assert_allclose(value, columns[name], rtol=1e-8, atol=1e-8, err_msg=f"{name} at {bar_index}")
+
+
+@pytest.mark.parametrize('indicator, arguments, options', INDICATORS)
+def test_update_matches_batch(indicator, arguments, options):
+    quotes = random_quotes(600, step=0.2)
+    batch = indicator(quotes, *arguments, **options)
+    if 'pace' in options:
+        # The default pace depends on the quotes the indicator is built with.
+        options = {**options, 'pace': batch.pace}
+    times = quotes.index.get_level_values('datetime')
+    first, second, third = times.unique()[[200, 400, 500]]
+
+    streamed = indicator(quotes[times < first], *arguments, **options)
+    for bar_index, bar in quotes[(times >= first) & (times < second)].iterrows():
+        assert_matches_batch(streamed.update(bar), batch, bar_index)
+
+    # Resumed from the last streamed bar over the next ones, and streamed again over the rest.
+    resumed = indicator(quotes[times < third], *arguments, **options, checkpoint=streamed.get_checkpoint())
+    resumed_columns = resumed.result.to_frame()
+    assert resumed_columns.index.get_level_values('datetime').min() == second
+    np.testing.assert_allclose(
+        resumed_columns.values, batch.result.to_frame().loc[resumed_columns.index].values, rtol=1e-8, atol=1e-8
+    )
+    np.testing.assert_array_equal(resumed.signals['signal'].values, batch.signals.loc[resumed.signals.index, 'signal'])
+    for bar_index, bar in quotes[times >= third].iterrows():
+        assert_matches_batch(resumed.update(bar), batch, bar_index)
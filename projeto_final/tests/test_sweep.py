@@ -0,0 +1,48 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import pandas as pd
+import pytest
+
+from simple_portfolio import sweep as sweep_module
+from simple_portfolio.bollinger import LMSBands
+from simple_portfolio.sweep import sweep, walk_forward
+from tests.synthetic import random_quotes
+
+PORTFOLIO_OPTIONS = {'initial_capital': 1e9, 'max_overall_exposition': 10 ** 6, 'max_single_exposition': 10 ** 6}
+
+
+def test_walk_forward_windows_do_not_see_later_bars():
+    quotes = random_quotes(3000, step=0.2)
+    grid = {'num_periods': [10, 20], 'deviations': [1.0, 2.0], 'long_periods': [30]}
+
+    windows = walk_forward(LMSBands, quotes, grid, PORTFOLIO_OPTIONS, in_sample=1000, out_of_sample=500)
+    # Only the bars of the first window, so the default pace can't depend on the bars after it.
+    first_window_quotes = quotes[quotes.index.get_level_values('datetime') <= windows['out_of_sample_end'][0]]
+    first_window = walk_forward(LMSBands, first_window_quotes, grid, PORTFOLIO_OPTIONS, 1000, 500)
+
+    assert len(windows) == 4
+    pd.testing.assert_frame_equal(first_window, windows.iloc[:1])
+
+
+def test_parallel_sweep_matches_serial_and_frees_shared_memory(monkeypatch):
+    quotes = random_quotes(1500, step=0.2)
+    grid = {'num_periods': [10, 20], 'deviations': [1.0, 2.0], 'long_periods': [30, 60]}
+    blocks = []
+    share_quotes = sweep_module._share_quotes
+
+    def recorded_share_quotes(quotes):
+        block, layout = share_quotes(quotes)
+        blocks.append(block.name)
+        return block, layout
+
+    monkeypatch.setattr(sweep_module, '_share_quotes', recorded_share_quotes)
+
+    parallel = sweep(LMSBands, quotes, grid, PORTFOLIO_OPTIONS, num_workers=2)
+    serial = sweep(LMSBands, quotes, grid, PORTFOLIO_OPTIONS)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert (serial['num_transactions'] > 0).all()
+    # The block the workers read the quotes from is gone once the sweep returns.
+    assert len(blocks) == 1
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=blocks[0])